@@ -1,4 +1,4 @@
 from .hungergames import HungerGames
 
 def setup(bot):
-    bot.add_cog(HungerGames())
\ No newline at end of file
+    bot.add_cog(HungerGames(bot))
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import time
+
+from .enums import ErrorCode
+
+
+class AutoplayScheduler:
+    """
+    Steps every autoplaying channel from a single task.
+
+    Channels wait in a heap ordered by when their next round is due. Each pass pops every channel that
+    is due, steps all of their games in one HungerGame.step_many call and then sends the results,
+    with a bounded number of sends in flight. A channel drops out of autoplay once its game is gone,
+    whether it was ended, won or replaced by a new game. A channel whose lock is held by a command is
+    skipped and retried shortly after.
+    """
+
+    # Discord allows 5 messages per 5 seconds in a channel
+    MIN_INTERVAL = 5
+    MAX_CONCURRENT_SENDS = 5
+    # seconds to wait before retrying a channel that was busy with a command
+    BUSY_RETRY = 1
+
+    def __init__(self, hunger_game, send, locks=None):
+        """
+        send - Coroutine function taking (channel_id, result) that posts a step result. Returns False if
+               the channel can no longer be posted to.
+        locks - The ChannelLocks commands hold while they use a channel's game.
+        """
+        self.hungerGame = hunger_game
+        self.__send = send
+        self.__locks = locks
+        self.__heap = []
+        # channel_id -> [interval, member_id, game, generation]
+        self.__entries = {}
+        self.__generation = 0
+        self.__wakeup = None
+        self.__task = None
+
+    def __contains__(self, channel_id):
+        return channel_id in self.__entries
+
+    def schedule(self, channel_id, member_id, game, interval):
+        interval = max(interval, self.MIN_INTERVAL)
+        self.__generation += 1
+        self.__entries[channel_id] = [interval, member_id, game, self.__generation]
+        heapq.heappush(self.__heap, (time.monotonic() + interval, self.__generation, channel_id))
+
+        if self.__task is None or self.__task.done():
+            self.__wakeup = asyncio.Event()
+            self.__task = asyncio.ensure_future(self.__run())
+        else:
+            self.__wakeup.set()
+        return interval
+
+    def cancel(self, channel_id):
+        # the heap entry goes stale and is skipped when it comes due
+        return self.__entries.pop(channel_id, None) is not None
+
+    def stop(self):
+        self.__entries.clear()
+        self.__heap.clear()
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    async def __run(self):
+        while len(self.__entries) > 0:
+            if len(self.__heap) == 0:
+                break
+            delay = self.__heap[0][0] - time.monotonic()
+            if delay > 0:
+                self.__wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.__wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self.__pop_due()
+            if len(due) == 0:
+                continue
+
+            results = self.hungerGame.step_many([(channel_id, member_id) for channel_id, member_id in due])
+            now = time.monotonic()
+            sends = []
+            for (channel_id, _), result in zip(due, results):
+                entry = self.__entries.get(channel_id)
+                if entry is None:
+                    continue
+                if type(result) is ErrorCode or result['footer'] is None:
+                    # the game is over or gone
+                    self.cancel(channel_id)
+                else:
+                    heapq.heappush(self.__heap, (now + entry[0], entry[3], channel_id))
+                if type(result) is not ErrorCode:
+                    sends.append((channel_id, result))
+            await self.__send_all(sends)
+
+    def __pop_due(self):
+        now = time.monotonic()
+        due = []
+        while len(self.__heap) > 0 and self.__heap[0][0] <= now:
+            _, generation, channel_id = heapq.heappop(self.__heap)
+            entry = self.__entries.get(channel_id)
+            if entry is None or entry[3] != generation:
+                continue
+            if self.hungerGame.active_games.get(channel_id) is not entry[2]:
+                # ended, or replaced by another game since autoplay was turned on
+                self.cancel(channel_id)
+                continue
+            if self.__locks is not None and self.__locks.locked(channel_id):
+                # step_many runs without yielding, so the game is safe once no command holds its channel
+                heapq.heappush(self.__heap, (now + self.BUSY_RETRY, generation, channel_id))
+                continue
+            due.append((channel_id, entry[1]))
+        return due
+
+    async def __send_all(self, sends):
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_SENDS)
+
+        async def send(channel_id, result):
+            async with semaphore:
+                try:
+                    ok = await self.__send(channel_id, result)
+                except Exception:
+                    ok = False
+                if ok is False:
+                    self.cancel(channel_id)
+
+        await asyncio.gather(*(send(channel_id, result) for channel_id, result in sends))
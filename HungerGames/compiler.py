@@ -0,0 +1,70 @@
+import random
+
+from .template import MessageTemplate
+
+
+class ActionTable:
+    """
+    The fatal or non-fatal actions of one event, bucketed by tribute count.
+
+    Actions are ordered by the number of tributes they need, so the actions
+    that fit `n` available tributes are always a prefix of the table and can
+    be sampled with a single draw. Passing `max_kills` also leaves out the
+    actions that kill more tributes than that; this only costs a scan of the
+    prefix when it actually excludes something.
+    """
+
+    def __init__(self, actions):
+        actions = [dict(a, template=MessageTemplate(a['msg'])) for a in actions]
+        self.actions = sorted(actions, key=lambda a: a['tributes'])
+        for i, a in enumerate(self.actions):
+            a['index'] = i
+        most = self.actions[-1]['tributes'] if self.actions else 0
+        self.most_kills = max((a.get('kills', 0) for a in self.actions), default=0)
+
+        # __fits[n] is the number of actions that need at most n tributes
+        self.__fits = [0] * (most + 1)
+        for a in self.actions:
+            self.__fits[a['tributes']] += 1
+        for n in range(1, most + 1):
+            self.__fits[n] += self.__fits[n - 1]
+
+    def __len__(self):
+        return len(self.actions)
+
+    def fits(self, available):
+        if available >= len(self.__fits):
+            return len(self.actions)
+        return self.__fits[available]
+
+    def __fitting(self, available, max_kills):
+        # the fitting actions when max_kills rules some out, otherwise None and the prefix is used
+        if max_kills is None or max_kills >= self.most_kills:
+            return None
+        return [a for a in self.actions[:self.fits(available)] if a.get('kills', 0) <= max_kills]
+
+    def fit_ratio(self, available, max_kills=None):
+        if not self.actions:
+            return 0.0
+        fitting = self.__fitting(available, max_kills)
+        n = self.fits(available) if fitting is None else len(fitting)
+        return n / len(self.actions)
+
+    def draw(self, available, rng=random, max_kills=None):
+        fitting = self.__fitting(available, max_kills)
+        if fitting is not None:
+            return fitting[rng.randrange(len(fitting))] if fitting else None
+        n = self.fits(available)
+        if n == 0:
+            return None
+        return self.actions[rng.randrange(n)]
+
+
+class CompiledEvent:
+    def __init__(self, event):
+        self.title = event['title']
+        self.description = event['description']
+        self.color = event['color']
+        self.fatal = ActionTable(event['fatal'])
+        self.nonfatal = ActionTable(event['nonfatal'])
+
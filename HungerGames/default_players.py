@@ -1,3 +1,5 @@
+import itertools
+
 default_players = {
     'hungergames': [
         ("Bot1"),
@@ -26,3 +28,10 @@ default_players = {
         ("Bot24"),
     ]
 }
+
+
+def generic_bots():
+    """
+    Bot1, Bot2, ... without end, for topping up games larger than the hungergames group.
+    """
+    return ("Bot{0}".format(i) for i in itertools.count(1))
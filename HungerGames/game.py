@@ -1,23 +1,49 @@
 import random
 import math
-from .enums import RoundType
-from .events import events
+import time
+from .enums import RoundType, GenderEnum
+from .player import Player
+from .pool import TributePool
+from .roster import RosterIndex
+from .packs import EventPack, default_pack
+from .replay import ReplayLog
+
+ROUND_TYPES = list(RoundType)
 
 
 class Game:
-    def __init__(self, owner_name, owner_id, title: str):
+    def __init__(self, owner_name, owner_id, title: str, seed: int = None, pack: EventPack = None,
+                 max_players: int = 24):
         self.owner_name = owner_name
         self.owner_id = owner_id
         self.title = title
+        self.max_players = max_players
         self.has_started = False
+        # time.monotonic() of the last command to use the game, for evicting abandoned games
+        self.last_touched = time.monotonic()
+        # bumped whenever a tribute joins, leaves or dies; renders of the roster are cached against it
+        self.roster_version = 0
+        self.render_cache = {}
+        # the events this game draws from, shared with every other game using the same pack
+        self.pack = pack if pack is not None else default_pack()
+
+        # Every roll of this game comes from its own generator, recorded in the replay log
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+        self.log = ReplayLog()
 
         # Player data
         self.players = {}
-        self.players_available_to_act = set()
+        # every tribute, and the living ones, in district order
+        self.__sorted_players = RosterIndex()
+        self.__sorted_alive = RosterIndex()
+        self.players_available_to_act = TributePool()
         self.players_dead_today = []
         self.total_players_alive = 0
+        self.round_actions = []
 
         # Round counting
+        self.rounds = 0
         self.day = 1
         self.days_since_last_event = 0
         self.consecutive_rounds_without_deaths = 0
@@ -30,32 +56,86 @@ class Game:
 
     @property
     def players_sorted(self):
-        l = list(self.players.values())
-        l.sort()
-        return l
+        return list(self.__sorted_players)
 
     def add_player(self, new_player):
         if new_player.name in self.players:
             return False
         self.players[new_player.name] = new_player
+        self.__sorted_players.add(new_player)
+        self.__sorted_alive.add(new_player)
+        self.roster_version += 1
         return True
 
     def remove_player(self, name):
         if name in self.players:
-            del self.players[name]
+            p = self.players.pop(name)
+            self.__sorted_players.remove(p)
+            self.__sorted_alive.remove(p)
+            self.roster_version += 1
             return True
         return False
 
     def start(self):
         self.total_players_alive = len(self.players)
         self.has_started = True
+        self.__roster = list(self.players.values())
+        self.__slots = {p: i for i, p in enumerate(self.__roster)}
+
+    def roster(self):
+        """
+        The tributes in roster slot order as (name, district, gender) tuples. Together with the
+        replay log this is all that is needed to regenerate the game with Game.replay.
+        """
+        return [(p.name, p.district, p.genderEnum.name) for p in self.__roster]
+
+    @classmethod
+    def from_roster(cls, owner_name, owner_id, title: str, roster, pack: EventPack = None):
+        """
+        Creates a started game with the tributes of a Game.roster, ready to replay its log.
+        The pack must be the one the log was played with.
+        """
+        game = cls(owner_name, owner_id, title, pack=pack)
+        for name, district, gender in roster:
+            game.add_player(Player(name, district, GenderEnum[gender]))
+        game.start()
+        return game
+
+    @classmethod
+    def replay(cls, owner_name, owner_id, title: str, roster, log: ReplayLog, pack: EventPack = None):
+        """
+        Regenerates the summary of every round recorded in `log`, in order.
+        """
+        game = cls.from_roster(owner_name, owner_id, title, roster, pack)
+        reader = log.reader()
+        while game.has_started and (not reader.exhausted or game.total_players_alive <= 1):
+            yield game.replay_step(reader)
+
+    def step(self, render=True):
+        """
+        Plays the next round. With render=False the round's action messages are not built, which is
+        cheaper when the round is only needed for its outcome and replay log.
+        """
+        return self.__play_round(self.rng, None, render)
+
+    def play_out(self):
+        """
+        Plays rounds without rendering them until the game has a winner or everyone is dead, and returns
+        the summary of the last round. Touches nothing but this game, so it may run on another thread.
+        """
+        summary = self.step(render=False)
+        while summary.get('winner') is None and summary.get('allDead') is None:
+            summary = self.step(render=False)
+        return summary
+
+    def replay_step(self, reader, render=True):
+        return self.__play_round(None, reader, render)
 
-    def step(self):
+    def __play_round(self, rng, reader, render):
         if self.total_players_alive is 1:
             self.has_started = False
-            for p in self.players.values():
-                if p.alive is True:
-                    return {'winner': p.name, 'district': p.district}
+            p = self.__sorted_alive[0]
+            return {'winner': p.name, 'district': p.district}
 
         if self.total_players_alive is 0:
             self.has_started = False
@@ -68,32 +148,34 @@ class Game:
             self.fallen_passed = False
             self.night_passed = False
 
-        feast_chance = 100 * (math.pow(self.days_since_last_event, 2) / 55.0) + (9.0 / 55.0)
-        fatality_factor = random.randint(2, 4) + self.consecutive_rounds_without_deaths
+        if reader is None:
+            fatality_factor = rng.randint(2, 4) + self.consecutive_rounds_without_deaths
+            step_type = self.__roll_round_type(rng)
+            self.log.write(ROUND_TYPES.index(step_type))
+        else:
+            # actions come from the log, so the factor goes unused
+            fatality_factor = 0
+            step_type = ROUND_TYPES[reader.read()]
 
-        if self.day is 1 and not self.bloodbath_passed:
-            step_type = RoundType.BLOODBATH
+        if step_type is RoundType.BLOODBATH:
             fatality_factor += 2
             self.bloodbath_passed = True
-        elif not self.day_passed and random.randint(0, 100) < feast_chance:
-            step_type = RoundType.FEAST
+        elif step_type is RoundType.FEAST:
             self.days_since_last_event = 0
             fatality_factor += 2
-        elif self.days_since_last_event > 0 and random.randint(1, 20) is 1:
-            step_type = RoundType.ARENA
+        elif step_type is RoundType.ARENA:
             self.days_since_last_event = 0
             fatality_factor += 1
-        elif not self.day_passed:
-            step_type = RoundType.DAY
+        elif step_type is RoundType.DAY:
             self.day_passed = True
-        elif self.day_passed and not self.fallen_passed:
-            step_type = RoundType.FALLEN
+        elif step_type is RoundType.FALLEN:
             self.fallen_passed = True
         else:
-            step_type = RoundType.NIGHT
             self.night_passed = True
 
-        self.players_available_to_act = {p for p in self.players.values() if p.alive is True}
+        self.players_available_to_act = TributePool(p for p in self.players.values() if p.alive is True)
+        self.round_actions = []
+        self.rounds += 1
 
         event = None
         if step_type is RoundType.FALLEN:
@@ -101,12 +183,21 @@ class Game:
             for p in self.players_dead_today:
                 messages.append("☠️ {0} | District {1}".format(p, p.district))
         else:
+            pack = self.pack
             if step_type is RoundType.ARENA:
-                event = events['arena'][random.randint(0, len(events['arena']) - 1)]
+                if reader is None:
+                    arena_event = rng.randint(0, len(pack['arena']) - 1)
+                    self.log.write(arena_event)
+                else:
+                    arena_event = reader.read()
+                event = pack['arena'][arena_event]
             else:
-                event = events[step_type.value]
+                event = pack[step_type.value]
             dead_players_now = len(self.players) - self.total_players_alive
-            messages = self.__generate_messages(fatality_factor, event)
+            if reader is None:
+                messages = self.__generate_messages(fatality_factor, event, rng, render)
+            else:
+                messages = self.__replay_messages(event, reader, render)
             if len(self.players) - self.total_players_alive == dead_players_now:
                 self.consecutive_rounds_without_deaths += 1
             else:
@@ -116,6 +207,7 @@ class Game:
             'day': self.day,
             'roundType': step_type.value,
             'messages': messages,
+            'actions': self.round_actions,
             'footer': "Tributes Remaining: {0}/{1} | Host: {2}"
                 .format(self.total_players_alive, len(self.players), self.owner_name)
         }
@@ -133,53 +225,93 @@ class Game:
                 summary['description'] = "No cannon shots are heard."
             summary['color'] = 0xaaaaaa
         else:
-            summary['title'] = "{0} | {1}".format(self.title, event['title'].format(self.day))
-            summary['description'] = event['description']
-            summary['color'] = event['color']
+            summary['title'] = "{0} | {1}".format(self.title, event.title.format(self.day))
+            summary['event'] = event.title
+            summary['description'] = event.description
+            summary['color'] = event.color
 
         return summary
 
-    def __generate_messages(self, fatality_factor, event):
+    def __roll_round_type(self, rng):
+        feast_chance = 100 * (math.pow(self.days_since_last_event, 2) / 55.0) + (9.0 / 55.0)
+
+        if self.day is 1 and not self.bloodbath_passed:
+            return RoundType.BLOODBATH
+        if not self.day_passed and rng.randint(0, 100) < feast_chance:
+            return RoundType.FEAST
+        if self.days_since_last_event > 0 and rng.randint(1, 20) is 1:
+            return RoundType.ARENA
+        if not self.day_passed:
+            return RoundType.DAY
+        if self.day_passed and not self.fallen_passed:
+            return RoundType.FALLEN
+        return RoundType.NIGHT
+
+    def __generate_messages(self, fatality_factor, event, rng, render):
         messages = []
+        # odds of random.randint(0, 18) < fatality_factor
+        fatal_roll = min(fatality_factor, 19) / 19.0
         while len(self.players_available_to_act) > 0:
-            f = random.randint(0, 18)
-            if f < fatality_factor and self.total_players_alive > 1:
+            available = len(self.players_available_to_act)
+
+            # Weighting each kind by the share of its actions that fit gives the same odds as rerolling
+            # until an action fits, but every pass through the loop now resolves an action.
+            # A fatal action must leave at least one tribute alive.
+            max_kills = self.total_players_alive - 1
+            fatal_chance = fatal_roll if self.total_players_alive > 1 else 0.0
+            fatal_weight = fatal_chance * event.fatal.fit_ratio(available, max_kills)
+            nonfatal_weight = (1.0 - fatal_chance) * event.nonfatal.fit_ratio(available)
+
+            fatal = rng.random() * (fatal_weight + nonfatal_weight) < fatal_weight
+            if fatal:
                 # time to die
-                action = random.choice(event['fatal'])
-                if action['killed'] is list and len(action['killed']) >= self.total_players_alive:
-                    # must have one player remaining
-                    continue
+                action = event.fatal.draw(available, rng, max_kills)
             else:
                 # live to see another round
-                action = random.choice(event['nonfatal'])
+                action = event.nonfatal.draw(available, rng)
 
             tributes = action['tributes']
-            if tributes > len(self.players_available_to_act):
-                # not enough tributes for this action
-                continue
+            active_players = [self.players_available_to_act.pop_random(rng) for _ in range(tributes)]
+
+            self.log.write(action['index'] << 1 | fatal)
+            for p in active_players:
+                self.log.write(self.__slots[p])
+
+            msg = self.__act(action, active_players, render)
+            if render:
+                messages.append(msg)
+        return messages
 
-            p = random.choice(tuple(self.players_available_to_act))
-            self.players_available_to_act.remove(p)
-            active_players = [p]
+    def __replay_messages(self, event, reader, render):
+        messages = []
+        while len(self.players_available_to_act) > 0:
+            code = reader.read()
+            table = event.fatal if code & 1 else event.nonfatal
+            action = table.actions[code >> 1]
 
-            extra_tributes = tributes - 1
-            while extra_tributes > 0:
-                p = random.choice(tuple(self.players_available_to_act))
+            active_players = [self.__roster[reader.read()] for _ in range(action['tributes'])]
+            for p in active_players:
                 self.players_available_to_act.remove(p)
-                active_players.append(p)
-                extra_tributes -= 1
-
-            msg = action['msg'].format(*active_players)
-
-            if action.get('killed') is not None:
-                if action.get('killer') is not None:
-                    for kr in action['killer']:
-                        active_players[kr].kills += len(action['killed'])
-                for kd in action['killed']:
-                    active_players[kd].alive = False
-                    self.players_dead_today.append(active_players[kd])
-                    self.total_players_alive -= 1
-                    active_players[kd].cause_of_death = msg
-
-            messages.append(msg)
+
+            msg = self.__act(action, active_players, render)
+            if render:
+                messages.append(msg)
         return messages
+
+    def __act(self, action, active_players, render):
+        # a death keeps its message as the cause even when the round is not rendered
+        msg = action['template'].render(active_players) if render or action['kills'] else None
+        self.round_actions.append(action)
+
+        if action['kills']:
+            for kr in action['killer']:
+                active_players[kr].kills += action['kills']
+            for kd in action['killed']:
+                active_players[kd].alive = False
+                self.__sorted_alive.remove(active_players[kd])
+                self.players_dead_today.append(active_players[kd])
+                self.total_players_alive -= 1
+                self.roster_version += 1
+                active_players[kd].cause_of_death = msg
+
+        return msg
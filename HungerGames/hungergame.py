@@ -1,32 +1,127 @@
-import random
+import heapq
+import itertools
 import math
+import time
+import weakref
 
 from .game import Game
 from .player import Player
+from .pool import reservoir_sample
 from .enums import ErrorCode
 from .enums import GenderEnum
+from .transcript import Transcript, format_round
+from .default_players import generic_bots
 
 
 class HungerGame:
 
-    active_games = {}
+    # the most tributes a server may allow in one game
+    MAX_PLAYERS = 5000
 
-    def new_game(self, channel_id, owner_id, owner_name, title):
-        if channel_id in self.active_games:
+    active_games = {}
+    store = None
+    packs = None
+
+    # (last_touched, sequence, channel_id, weakref to the game), one entry per active game. An entry is only
+    # brought up to date when it reaches the top, so a touch costs nothing and an eviction pass only looks at
+    # expired games. The entries of ended games are counted in __stale_idle and dropped in one sweep once
+    # they outnumber the active games, whether or not idle games are being evicted.
+    __idle = []
+    __stale_idle = 0
+    __sequence = itertools.count()
+
+    # lookups of the per-game render cache used by status and start_game
+    render_cache_hits = 0
+    render_cache_misses = 0
+
+    def __get_game(self, channel_id):
+        this_game = self.active_games.get(channel_id)
+        if this_game is None and self.store is not None:
+            # restore games saved before a restart the first time their channel is used
+            this_game = self.store.load(channel_id)
+            if this_game is not None:
+                self.__activate(channel_id, this_game)
+        if this_game is not None:
+            this_game.last_touched = time.monotonic()
+        return this_game
+
+    def __activate(self, channel_id, this_game):
+        self.active_games[channel_id] = this_game
+        heapq.heappush(self.__idle, (this_game.last_touched, next(self.__sequence), channel_id,
+                                     weakref.ref(this_game)))
+
+    def __is_active(self, channel_id, game_ref):
+        this_game = game_ref()
+        return this_game is not None and self.active_games.get(channel_id) is this_game
+
+    def __prune_idle(self):
+        self.__idle[:] = [entry for entry in self.__idle if self.__is_active(entry[2], entry[3])]
+        heapq.heapify(self.__idle)
+        self.__stale_idle = 0
+
+    def evict_idle(self, ttl, spill=True, busy=None):
+        """
+        Removes games no command has used for `ttl` seconds and returns their channel ids.
+
+        spill - Keep an evicted game's snapshot so it is restored the next time its channel is used.
+                Otherwise the game is discarded as if it had been ended.
+        busy - Predicate on a channel id; games in busy channels are kept until a later pass.
+        """
+        now = time.monotonic()
+        evicted = []
+        while len(self.__idle) > 0 and self.__idle[0][0] + ttl <= now:
+            _, _, channel_id, game_ref = heapq.heappop(self.__idle)
+            if not self.__is_active(channel_id, game_ref):
+                # ended or replaced since
+                self.__stale_idle = max(self.__stale_idle - 1, 0)
+                continue
+            this_game = game_ref()
+            if this_game.last_touched + ttl > now:
+                # used since it was queued, requeue it for when it will actually have been idle
+                heapq.heappush(self.__idle, (this_game.last_touched, next(self.__sequence), channel_id, game_ref))
+                continue
+            if busy is not None and busy(channel_id):
+                # look again in a second
+                heapq.heappush(self.__idle, (now - ttl + 1, next(self.__sequence), channel_id, game_ref))
+                continue
+            # the entry is already off the heap, so neither way leaves a stale one behind
+            if spill and self.store is not None:
+                self.active_games.pop(channel_id)
+            else:
+                self.__discard_game(channel_id, queued=False)
+            evicted.append(channel_id)
+        return evicted
+
+    def __discard_game(self, channel_id, queued=True):
+        if self.store is not None:
+            self.store.delete(channel_id)
+        this_game = self.active_games.pop(channel_id)
+        if queued:
+            self.__stale_idle += 1
+            if self.__stale_idle > len(self.active_games):
+                self.__prune_idle()
+        return this_game
+
+    def new_game(self, channel_id, owner_id, owner_name, title, seed=None, guild_id=None, max_players=24):
+        if self.__get_game(channel_id) is not None:
             return ErrorCode.GAME_EXISTS
-        self.active_games[channel_id] = Game(owner_name, owner_id, title)
+        pack = self.packs.for_guild(guild_id) if self.packs is not None and guild_id is not None else None
+        this_game = Game(owner_name, owner_id, title, seed, pack, max_players)
+        self.__activate(channel_id, this_game)
+        if self.store is not None:
+            self.store.create(channel_id, this_game)
         return True
 
     def add_player(self, channel_id, name, gender: str = "OTHER", isVolunteer: bool = False):
-        if channel_id not in self.active_games:
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
 
         genderEnum: GenderEnum = GenderEnum.OTHER
 
         if this_game.has_started:
             return ErrorCode.GAME_STARTED
-        if len(this_game.players) >= 24:
+        if len(this_game.players) >= this_game.max_players:
             return ErrorCode.GAME_FULL
 
         if gender is not None:
@@ -41,6 +136,15 @@ class HungerGame:
         else:
             genderEnum = GenderEnum.OTHER
 
+        p = self.__enlist(this_game, name, genderEnum)
+        if type(p) is ErrorCode:
+            return p
+        if self.store is not None:
+            self.store.add_players(channel_id, [p])
+        return self.__announce(p, isVolunteer)
+
+    def __enlist(self, this_game, name, genderEnum):
+        # Adds a tribute to the game without saving it, returns the Player or the ErrorCode
         if len(name) > 32:
             return ErrorCode.CHAR_LIMIT
             # Maybe just trim...
@@ -49,6 +153,10 @@ class HungerGame:
         p = Player(name, district, genderEnum)
         if not this_game.add_player(p):
             return ErrorCode.PLAYER_EXISTS
+        return p
+
+    def __announce(self, p, isVolunteer):
+        genderEnum = p.genderEnum
         gender_symbol = "×"
         if genderEnum == GenderEnum.MALE:
             gender_symbol = "♂"
@@ -63,48 +171,74 @@ class HungerGame:
         return "**District {0} {1} | {2}** {3} to be a tribute!".format(p.district, gender_symbol, p.name, reason)
 
     def remove_player(self, channel_id, name):
-        if channel_id not in self.active_games:
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
 
         if this_game.has_started:
             return ErrorCode.GAME_STARTED
 
         if not this_game.remove_player(name):
             return ErrorCode.PLAYER_DOES_NOT_EXIST
+        if self.store is not None:
+            self.store.remove_player(channel_id, name)
         return "Player {0} was removed from the game.".format(name)
 
     def pad_players(self, channel_id, group):
-        if channel_id not in self.active_games:
+        """
+        Fills the open slots of the game with names drawn at random from `group`, any iterable of names,
+        which is read once. Slots the group can't fill are given generic bots.
+        """
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
 
         if this_game.has_started:
             return ErrorCode.GAME_STARTED
-        if len(this_game.players) >= 24:
+        if len(this_game.players) >= this_game.max_players:
             return ErrorCode.GAME_FULL
         if group is None:
             return ErrorCode.INVALID_GROUP
 
-        new_players = random.sample(group, min(24 - len(this_game.players), len(group)))
-        messages = []
+        open_slots = this_game.max_players - len(this_game.players)
+        candidates = (p for p in group if (p[0] if type(p) is tuple else p) not in this_game.players)
+        new_players = reservoir_sample(candidates, open_slots, this_game.rng)
+        if len(new_players) < open_slots:
+            # not enough to fill the game, top it up with generic bots
+            taken = set(p[0] if type(p) is tuple else p for p in new_players)
+            bots = (b for b in generic_bots() if b not in this_game.players and b not in taken)
+            new_players.extend(itertools.islice(bots, open_slots - len(new_players)))
+        added = []
         for p in new_players:
-            if type(p) is tuple:
-                ret = self.add_player(channel_id, p[0])
-            else:
-                ret = self.add_player(channel_id, p)
-            if ret is not ErrorCode.PLAYER_EXISTS:
-                messages.append(ret)
+            ret = self.__enlist(this_game, p[0] if type(p) is tuple else p, GenderEnum.OTHER)
+            if type(ret) is not ErrorCode:
+                added.append(ret)
+        # saved with a single write rather than one per tribute
+        if self.store is not None and len(added) > 0:
+            self.store.add_players(channel_id, added)
+        messages = [self.__announce(p, False) for p in added]
 
         if len(messages) == 0:
             return "No tributes were added."
         return "{0}".format("\n".join(messages))
 
-    def status(self, channel_id):
-        if channel_id not in self.active_games:
-            return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
-
+    def render_cache_stats(self):
+        return {'hits': HungerGame.render_cache_hits, 'misses': HungerGame.render_cache_misses}
+
+    def __cached(self, this_game, key, render):
+        """
+        The value `render(this_game)` last produced for `key`, rendered again only if the roster has changed since.
+        """
+        entry = this_game.render_cache.get(key)
+        if entry is not None and entry[0] == this_game.roster_version:
+            HungerGame.render_cache_hits += 1
+            return entry[1]
+        HungerGame.render_cache_misses += 1
+        value = render(this_game)
+        this_game.render_cache[key] = (this_game.roster_version, value)
+        return value
+
+    def __render_roster(self, this_game):
         player_list = []
         for p in this_game.players_sorted:
             gender_symbol = "×"
@@ -116,23 +250,33 @@ class HungerGame:
                 player_list.append("District {0} {1} | {2}".format(p.district, gender_symbol, p.name))
             else:
                 player_list.append("~~District {0} {1} | {2}~~".format(p.district, gender_symbol, p.name))
+        return "\n".join(player_list)
 
+    def __render_status(self, this_game):
         summary = {
             'title': this_game.title,
-            'footer': "Players: {0}/24 | Host: {1}"
-                .format(len(this_game.players), this_game.owner_name)
+            'footer': "Players: {0}/{1} | Host: {2}"
+                .format(len(this_game.players), this_game.max_players, this_game.owner_name)
         }
 
-        if len(player_list) == 0:
+        if len(this_game.players) == 0:
             summary['description'] = "No players have joined yet"
         else:
-            summary['description'] = "The following tributes are currently in the game:\n\n" + "\n".join(player_list)
+            summary['description'] = "The following tributes are currently in the game:\n\n" + \
+                                     self.__cached(this_game, 'roster', self.__render_roster)
         return summary
 
+    def status(self, channel_id):
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
+            return ErrorCode.NO_GAME
+
+        return dict(self.__cached(this_game, 'status', self.__render_status))
+
     def start_game(self, channel_id, member_id, prefix):
-        if channel_id not in self.active_games:
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
 
         if member_id != this_game.owner_id:
             return ErrorCode.NOT_OWNER
@@ -142,45 +286,93 @@ class HungerGame:
             return ErrorCode.NOT_ENOUGH_PLAYERS
 
         this_game.start()
-        player_list = []
-        for p in this_game.players_sorted:
-            gender_symbol = "×"
-            if p.genderEnum == GenderEnum.MALE:
-                gender_symbol = "♂"
-            if p.genderEnum == GenderEnum.FEMALE:
-                gender_symbol = "♀"
-            player_list.append("District {0} {1} | {2}".format(p.district, gender_symbol, p.name))
+        if self.store is not None:
+            self.store.start(channel_id, this_game)
+        # nobody has died yet, so this is the same roster status shows
+        player_list = self.__cached(this_game, 'roster', self.__render_roster)
 
         return {'title': "{0} | The Reaping".format(this_game.title),
                 'footer': "Total Players: {0} | Owner {1}".format(len(this_game.players), this_game.owner_name),
                 'description': "The Reaping has concluded! Here are the tributes:\n\n{0}\n\n{1}, you may now "
-                               "proceed the simulation with `{2}hg step`.".format("\n".join(player_list),
+                               "proceed the simulation with `{2}hg step`.".format(player_list,
                                                                                this_game.owner_name,prefix)}
 
     def end_game(self, channel_id, owner_id):
-        if channel_id not in self.active_games:
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
         if owner_id != this_game.owner_id:
             return ErrorCode.NOT_OWNER
 
-        return self.active_games.pop(channel_id)
-
-    def step(self, channel_id, member_id):
-
-        if channel_id not in self.active_games:
+        return self.__discard_game(channel_id)
+
+    def set_pack(self, guild_id, data: bytes):
+        """
+        Makes the event pack file contents `data` the guild's pack for new games. Raises EventPackError if it is invalid.
+        """
+        self.packs.register(guild_id, data)
+        return "New games in this server will use the uploaded event pack. Games already running keep their events."
+
+    def reset_pack(self, guild_id):
+        if not self.packs.reset(guild_id):
+            return "This server is already using the default event pack."
+        return "New games in this server will use the default event pack."
+
+    def running_game(self, channel_id, member_id):
+        """
+        Returns the started game in the channel if `member_id` owns it, otherwise the ErrorCode a step would give.
+        """
+        this_game = self.__get_game(channel_id)
+        if this_game is None:
             return ErrorCode.NO_GAME
-        this_game = self.active_games[channel_id]
-
         if member_id != this_game.owner_id:
             return ErrorCode.NOT_OWNER
         if not this_game.has_started:
             return ErrorCode.GAME_NOT_STARTED
+        return this_game
 
-        summary = this_game.step()
-
+    def step(self, channel_id, member_id):
+        return self.step_many([(channel_id, member_id)])[0]
+
+    def step_many(self, requests):
+        """
+        Steps the games for several (channel_id, member_id) requests in one call.
+        Returns a result (or ErrorCode) for each request, in order. Every request is checked on its own;
+        a channel is only stepped once per call and its allowed requests share the round's result.
+        """
+        results = [None] * len(requests)
+        pending = []
+        # channel_id -> index of the request its game is stepped for
+        stepped = {}
+        for i, (channel_id, member_id) in enumerate(requests):
+            ret = self.running_game(channel_id, member_id)
+            if type(ret) is ErrorCode:
+                results[i] = ret
+            elif channel_id not in stepped:
+                stepped[channel_id] = i
+                pending.append(i)
+
+        games = [self.active_games[requests[i][0]] for i in pending]
+        summaries = [g.step() for g in games]
+        for i, this_game, summary in zip(pending, games, summaries):
+            results[i] = self.__format_step(requests[i][0], this_game, summary)
+        for i, (channel_id, _) in enumerate(requests):
+            if results[i] is None:
+                results[i] = results[stepped[channel_id]]
+        return results
+
+    def finish(self, channel_id, this_game, first_round, summary, render=None):
+        """
+        Ends a game played out with Game.play_out and returns the Transcript of its rounds from `first_round`.
+        `summary` is the last round play_out returned. The rounds are not rendered here; the transcript
+        renders each page when it is first viewed.
+        """
+        result = self.__format_step(channel_id, this_game, summary)
+        return Transcript(this_game, first_round, result, render)
+
+    def __format_step(self, channel_id, this_game, summary):
         if summary.get('winner') is not None:
-            self.active_games.pop(channel_id)
+            self.__discard_game(channel_id)
             return {
                 'title': "{0} | Winner".format(this_game.title),
                 'color': 0xd0d645,
@@ -189,7 +381,7 @@ class HungerGame:
             }
 
         if summary.get('allDead') is not None:
-            self.active_games.pop(channel_id)
+            self.__discard_game(channel_id)
             return {
                 'title': "{0} | Winner".format(this_game.title),
                 'color': 0xd0d645,
@@ -197,16 +389,7 @@ class HungerGame:
                 'footer': None
             }
 
-        if summary['description'] is not None and len(summary['messages']) > 0:
-            formatted_msg = "{0}\n\n> {1}".format(summary['description'], "\n> ".join(summary['messages']))
-        elif summary['description'] is not None:
-            formatted_msg = summary['description']
-        else:
-            formatted_msg = "> {0}".format("\n> ".join(summary['messages']))
+        if self.store is not None:
+            self.store.round(channel_id, this_game)
 
-        return {
-            'title': summary['title'],
-            'color': summary['color'],
-            'description': formatted_msg,
-            'footer': summary['footer']
-        }
+        return format_round(summary)
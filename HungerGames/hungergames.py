@@ -1,18 +1,55 @@
 from redbot.core import commands, checks
 from redbot.core.config import Config
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.menus import menu, DEFAULT_CONTROLS
+from redbot.core.utils.chat_formatting import pagify
+import asyncio
 import discord
-import re, random
 
 from .default_players import default_players
 from .hungergame import HungerGame
 from .enums import ErrorCode
+from .snapshot import SnapshotStore
+from .autoplay import AutoplayScheduler
+from .packs import EventPackError, PackStore, default_pack
+from .sanitize import sanitize
+from .locks import ChannelLocks
 
 class HungerGames(commands.Cog):
 
     hungerGame: HungerGame = HungerGame()
 
-    def __init__(self):
+    MAX_PACK_SIZE = 1024 * 1024
+    # discord.py rejects embed descriptions longer than this
+    EMBED_DESCRIPTION_LIMIT = 2048
+    # seconds between passes evicting idle games
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, bot):
+        self.bot = bot
         self.config = Config.get_conf(self, identifier=59483726163217890101)
+        self.config.register_guild(max_players=24)
+        # idle_ttl is in seconds, 0 keeps games until they are ended
+        self.config.register_global(idle_ttl=6 * 60 * 60, spill_idle=True)
+        self.hungerGame.packs = PackStore(cog_data_path(self) / "packs")
+        self.hungerGame.store = SnapshotStore(cog_data_path(self) / "games", self.hungerGame.packs)
+        # validated once per events.json content, later reloads read the cached compact form
+        default_pack(cog_data_path(self) / "packs" / "cache")
+        self.locks = ChannelLocks()
+        self.scheduler = AutoplayScheduler(self.hungerGame, self.__send_autoplay, self.locks)
+        self.sweeper = asyncio.ensure_future(self.__sweep_idle())
+
+    def cog_unload(self):
+        self.scheduler.stop()
+        self.sweeper.cancel()
+
+    async def __sweep_idle(self):
+        while True:
+            await asyncio.sleep(self.SWEEP_INTERVAL)
+            ttl = await self.config.idle_ttl()
+            if ttl > 0:
+                spill = await self.config.spill_idle()
+                self.hungerGame.evict_idle(ttl, spill, self.locks.locked)
 
     @commands.group()
     async def hg(self, ctx: commands.Context):
@@ -32,16 +69,17 @@ class HungerGames(commands.Cog):
         if title is None or title == "":
             title = "The Hunger Games"
         else:
-            title = self.__strip_mentions(ctx.message, title)
-            title = self.__sanitize_here_everyone(title)
-            title = self.__sanitize_special_chars(title)
+            title = self.__sanitize(ctx.message, title)
         owner = ctx.author
-        ret = self.hungerGame.new_game(ctx.channel.id, owner.id, owner.name, title)
+        max_players = await self.config.guild(ctx.guild).max_players()
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.new_game(ctx.channel.id, owner.id, owner.name, title, guild_id=ctx.guild.id,
+                                           max_players=max_players)
         if not await self.__check_errors(ctx, ret):
             return
         await ctx.send(
-            "{0} has started {1}! Use `{2}hg add <name>` to add a player or `{2}hg join [-m|-f|-o]` to enter the game yourself!\nOr use `{2}hg fill` to fill remaining slots with bots! There are a max of 24 slots, min of 2.\n\nUse `{2}hg start` to start!"
-            .format(owner.mention, title, ctx.clean_prefix))
+            "{0} has started {1}! Use `{2}hg add <name>` to add a player or `{2}hg join [-m|-f|-o]` to enter the game yourself!\nOr use `{2}hg fill` to fill remaining slots with bots! There are a max of {3} slots, min of 2.\n\nUse `{2}hg start` to start!"
+            .format(owner.mention, title, ctx.clean_prefix, max_players))
 
     @hg.command()
     @checks.bot_in_a_guild()
@@ -52,7 +90,8 @@ class HungerGames(commands.Cog):
         gender (Optional) - Use `-m`, `-f` or `-o` to set male, female or other gender. Defaults to other.
         """
         name = ctx.author.nick if ctx.author.nick is not None else ctx.author.name
-        ret = self.hungerGame.add_player(ctx.channel.id, name, gender=gender, isVolunteer=True)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.add_player(ctx.channel.id, name, gender=gender, isVolunteer=True)
         if not await self.__check_errors(ctx, ret):
             return
         await ctx.send(ret)
@@ -66,11 +105,10 @@ class HungerGames(commands.Cog):
         name - The name of the tribute to add. Limit 32 chars. Leading and trailing whitespace will be trimmed.
         Special chars @*_`~ count for two characters each.
         """
-        name = self.__strip_mentions(ctx.message, name)
-        name = self.__sanitize_here_everyone(name)
-        name = self.__sanitize_special_chars(name)
+        name = self.__sanitize(ctx.message, name)
 
-        ret = self.hungerGame.add_player(ctx.channel.id, name, gender="OTHER", isVolunteer=False)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.add_player(ctx.channel.id, name, gender="OTHER", isVolunteer=False)
         if not await self.__check_errors(ctx, ret):
             return
         await ctx.send(ret)
@@ -84,48 +122,41 @@ class HungerGames(commands.Cog):
 
         name - The name of the tribute to remove.
         """
-        name = self.__strip_mentions(ctx.message, name)
-        name = self.__sanitize_here_everyone(name)
-        name = self.__sanitize_special_chars(name)
+        name = self.__sanitize(ctx.message, name)
 
-        ret = self.hungerGame.remove_player(ctx.channel.id, name)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.remove_player(ctx.channel.id, name)
         if not await self.__check_errors(ctx, ret):
             return
         await ctx.send(ret)
 
     @hg.command()
     @checks.bot_in_a_guild()
-    async def fill(self, ctx: commands.Context, fill_with_members: str = None):
+    async def fill(self, ctx: commands.Context, fill_with_members: str = None, *, role: discord.Role = None):
         """
         Pad out empty slots in a new game with default characters.
 
-        fill_with_members (Optional) - If set to anything, empty slots will be filled with random members of the server. Otherwise fills with generic bots.
+        fill_with_members (Optional) - `online` fills empty slots with random online members of the server, anything else with random members. Otherwise fills with generic bots.
+        role (Optional) - Only pick members with this role.
         """
-        group = []
         if fill_with_members is not None:
-
-            members:list  = ctx.guild.members
-            for i in range(len(members)):
-                m = random.choice(members)
-                members.remove(m)
-                if m.nick is not None:
-                    group.append(m.nick)
-                else:
-                    group.append(m.name)
+            # a role's members are already narrowed down, so only walk the whole guild without one
+            members = role.members if role is not None else ctx.guild.members
+            online = fill_with_members.lower() == "online"
+            group = (m.display_name for m in members if not online or m.status is not discord.Status.offline)
         else:
             group = default_players.get("hungergames")
 
-        if (len(group) < 24):
-            group2 = default_players.get("hungergames")
-            while len(group) < 24:
-                bot = random.choice(group2)
-                group2.remove(bot)
-                group.append(bot)
-
-        ret = self.hungerGame.pad_players(ctx.channel.id, group)
+        # pad_players tops the game up with generic bots when the group runs out
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.pad_players(ctx.channel.id, group)
         if not await self.__check_errors(ctx, ret):
             return
-        await ctx.send(ret)
+        pages = list(pagify(ret))
+        if len(pages) == 1:
+            await ctx.send(pages[0])
+        else:
+            await menu(ctx, pages, DEFAULT_CONTROLS)
 
     @hg.command()
     @checks.bot_in_a_guild()
@@ -133,12 +164,11 @@ class HungerGames(commands.Cog):
         """
         Gets the status for the game in the channel.
         """
-        ret = self.hungerGame.status(ctx.channel.id)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.status(ctx.channel.id)
         if not await self.__check_errors(ctx, ret):
             return
-        embed = discord.Embed(title=ret['title'], description=ret['description'])
-        embed.set_footer(text=ret['footer'])
-        await ctx.send(embed=embed)
+        await self.__send_pages(ctx, self.__embeds(ret))
 
     @hg.command()
     @checks.bot_in_a_guild()
@@ -146,12 +176,11 @@ class HungerGames(commands.Cog):
         """
         Starts the pending game in the channel.
         """
-        ret = self.hungerGame.start_game(ctx.channel.id, ctx.author.id, ctx.clean_prefix)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.start_game(ctx.channel.id, ctx.author.id, ctx.clean_prefix)
         if not await self.__check_errors(ctx, ret):
             return
-        embed = discord.Embed(title=ret['title'], description=ret['description'])
-        embed.set_footer(text=ret['footer'])
-        await ctx.send(embed=embed)
+        await self.__send_pages(ctx, self.__embeds(ret))
 
     @hg.command()
     @checks.bot_in_a_guild()
@@ -159,9 +188,11 @@ class HungerGames(commands.Cog):
         """
         Cancels the current game in the channel.
         """
-        ret = self.hungerGame.end_game(ctx.channel.id, ctx.author.id)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.end_game(ctx.channel.id, ctx.author.id)
         if not await self.__check_errors(ctx, ret):
             return
+        self.scheduler.cancel(ctx.channel.id)
         await ctx.send(
             "{0} has been cancelled. Anyone may now start a new game with `{1}hg new`.".format(ret.title, ctx.clean_prefix))
 
@@ -171,13 +202,208 @@ class HungerGames(commands.Cog):
         """
         Steps forward the current game in the channel by one round.
         """
-        ret = self.hungerGame.step(ctx.channel.id, ctx.author.id)
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.step(ctx.channel.id, ctx.author.id)
         if not await self.__check_errors(ctx, ret):
             return
-        embed = discord.Embed(title=ret['title'], color=ret['color'], description=ret['description'])
+        # a large round is one message the reader pages through, not a message per page
+        await self.__send_pages(ctx, self.__embeds(ret))
+
+    @hg.command()
+    @checks.bot_in_a_guild()
+    async def finish(self, ctx):
+        """
+        Plays the current game in the channel through to the end.
+        Every remaining round is shown as a page you can flip through.
+        Only the game's host may use this command.
+        """
+        # the channel stays locked while the game is played out on another thread
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.running_game(ctx.channel.id, ctx.author.id)
+            if type(ret) is not ErrorCode:
+                # only the rounds are played there, the games and the snapshot store are updated on the loop
+                first_round = ret.rounds
+                summary = await ctx.bot.loop.run_in_executor(None, ret.play_out)
+                ret = self.hungerGame.finish(ctx.channel.id, ret, first_round, summary, self.__step_embed)
+        if not await self.__check_errors(ctx, ret):
+            return
+        await menu(ctx, ret, DEFAULT_CONTROLS)
+
+    @hg.command()
+    @checks.bot_in_a_guild()
+    async def autoplay(self, ctx, seconds: int = 0):
+        """
+        Steps the current game in the channel automatically until there is a winner.
+        Only the game's host may use this command.
+
+        seconds (Optional) - Seconds between rounds, at least 5. Use 0 or leave empty to stop autoplaying.
+        """
+        async with self.locks.hold(ctx.channel.id):
+            ret = self.hungerGame.running_game(ctx.channel.id, ctx.author.id)
+        if not await self.__check_errors(ctx, ret):
+            return
+        if seconds <= 0:
+            if self.scheduler.cancel(ctx.channel.id):
+                await ctx.send("Autoplay has been stopped. Use `{0}hg step` to continue.".format(ctx.clean_prefix))
+            else:
+                await ctx.send("This game is not autoplaying.")
+            return
+        interval = self.scheduler.schedule(ctx.channel.id, ctx.author.id, ret, seconds)
+        await ctx.send("The game will now advance every {0} seconds. Use `{1}hg autoplay 0` to stop."
+                       .format(interval, ctx.clean_prefix))
+
+    async def __send_autoplay(self, channel_id, ret):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return False
+        # one message per round keeps every autoplaying channel within MIN_INTERVAL, long rounds are cut short
+        await channel.send(embed=self.__step_embed(ret))
+        return True
+
+    def __step_embed(self, ret):
+        """
+        A single embed for the result, with the description cut short to fit if it is too long.
+        """
+        description = ret['description']
+        limit = self.EMBED_DESCRIPTION_LIMIT
+        if len(description) > limit:
+            lines = description.split("\n")
+            kept = []
+            size = 0
+            for line in lines:
+                # leave room for the note on how many lines were left out
+                if size + len(line) + 1 > limit - 64:
+                    break
+                kept.append(line)
+                size += len(line) + 1
+            description = "\n".join(kept) + "\n\n*...and {0} more lines*".format(len(lines) - len(kept))
+        embed = discord.Embed(title=ret['title'], color=ret.get('color', discord.Embed.Empty),
+                              description=description)
         if ret['footer'] is not None:
             embed.set_footer(text=ret['footer'])
-        await ctx.send(embed=embed)
+        return embed
+
+    def __embeds(self, ret):
+        """
+        The result split over as many embeds as its description needs, breaking between lines.
+        """
+        pages = list(pagify(ret['description'], page_length=self.EMBED_DESCRIPTION_LIMIT))
+        if len(pages) == 0:
+            pages = [ret['description']]
+        embeds = []
+        for i, page in enumerate(pages):
+            title = ret['title'] if len(pages) == 1 else "{0} ({1}/{2})".format(ret['title'], i + 1, len(pages))
+            embed = discord.Embed(title=title, color=ret.get('color', discord.Embed.Empty), description=page)
+            if ret['footer'] is not None:
+                embed.set_footer(text=ret['footer'])
+            embeds.append(embed)
+        return embeds
+
+    async def __send_pages(self, ctx, embeds):
+        if len(embeds) == 1:
+            await ctx.send(embed=embeds[0])
+        else:
+            await menu(ctx, embeds, DEFAULT_CONTROLS)
+
+    @hg.command(name="slots")
+    @checks.bot_in_a_guild()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def slots(self, ctx, max_players: int = None):
+        """
+        Sets the most tributes a new game in this server can have.
+
+        max_players (Optional) - The new limit, from 2 up to 5000. Leave empty to see the current limit.
+        """
+        if max_players is None:
+            await ctx.send("New games in this server can have up to {0} tributes."
+                           .format(await self.config.guild(ctx.guild).max_players()))
+            return
+        if not 2 <= max_players <= HungerGame.MAX_PLAYERS:
+            await ctx.send("The limit must be between 2 and {0}.".format(HungerGame.MAX_PLAYERS))
+            return
+        await self.config.guild(ctx.guild).max_players.set(max_players)
+        await ctx.send("New games in this server can now have up to {0} tributes.".format(max_players))
+
+    @hg.group(name="pack")
+    @checks.bot_in_a_guild()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def pack(self, ctx: commands.Context):
+        """
+        Manages the events new games in this server are played with.
+        """
+        pass
+
+    @pack.command(name="set")
+    async def pack_set(self, ctx):
+        """
+        Uses the event pack attached to the message for new games in this server.
+
+        The pack is a JSON file with the same layout as the default pack: a `bloodbath`, `day`, `night` and
+        `feast` event and a list of `arena` events, each with a title, description, color and lists of
+        `fatal` and `nonfatal` actions.
+        """
+        if len(ctx.message.attachments) == 0:
+            await ctx.send("Attach the event pack's JSON file to the command.")
+            return
+        attachment = ctx.message.attachments[0]
+        if attachment.size > self.MAX_PACK_SIZE:
+            await ctx.send("That event pack is too large (max {0} KB).".format(self.MAX_PACK_SIZE // 1024))
+            return
+        data = await attachment.read()
+        try:
+            ret = self.hungerGame.set_pack(ctx.guild.id, data)
+        except EventPackError as e:
+            await ctx.send("That is not a valid event pack: {0}".format(e))
+            return
+        await ctx.send(ret)
+
+    @pack.command(name="reset")
+    async def pack_reset(self, ctx):
+        """
+        Goes back to the default events for new games in this server.
+        """
+        await ctx.send(self.hungerGame.reset_pack(ctx.guild.id))
+
+    @hg.command()
+    @checks.is_owner()
+    async def idle(self, ctx, minutes: int = None, spill: bool = True):
+        """
+        Sets how long a game can go unused before it is removed from memory.
+
+        minutes (Optional) - Idle time before a game is removed. Use 0 to keep games until they are ended. Leave empty to see the current setting.
+        spill (Optional) - If true, removed games stay saved and resume the next time their channel uses them. Otherwise they are ended. Defaults to true.
+        """
+        if minutes is None:
+            ttl = await self.config.idle_ttl()
+            if ttl == 0:
+                await ctx.send("Idle games are never removed.")
+            else:
+                await ctx.send("Games idle for {0} minutes are {1}.".format(
+                    ttl // 60, "saved and removed from memory" if await self.config.spill_idle() else "ended"))
+            return
+        if minutes < 0:
+            await ctx.send("The idle time can't be negative.")
+            return
+        await self.config.idle_ttl.set(minutes * 60)
+        await self.config.spill_idle.set(spill)
+        if minutes == 0:
+            await ctx.send("Idle games will no longer be removed.")
+        else:
+            await ctx.send("Games idle for {0} minutes will now be {1}.".format(
+                minutes, "saved and removed from memory" if spill else "ended"))
+
+    @hg.command()
+    @checks.is_owner()
+    async def cachestats(self, ctx):
+        """
+        Shows how often the tribute lists of status and start were reused instead of rendered again, since the bot started.
+        """
+        stats = self.hungerGame.render_cache_stats()
+        total = stats['hits'] + stats['misses']
+        if total == 0:
+            await ctx.send("Nothing has been rendered yet.")
+            return
+        await ctx.send("Render cache hits: {0}/{1} ({2:.1%}).".format(stats['hits'], total, stats['hits'] / total))
 
     async def __check_errors(self, ctx, error_code):
         if type(error_code) is not ErrorCode:
@@ -217,32 +443,8 @@ class HungerGames(commands.Cog):
             await ctx.send("There is no player with that name in this game.")
             return False
 
-    def __strip_mentions(self, message: discord.Message, text):
-        members = message.mentions
-        channels = message.channel_mentions
-        roles = message.role_mentions
-
-        for m in members:
-            name = m.nick if m.nick is not None else m.name
-            text = re.sub(m.mention, name, text)
-
-        for c in channels:
-            text = re.sub(c.mention, c.name, text)
-
-        for r in roles:
-            text = re.sub(r.mention, r.name, text)
-
-        return text
-
-    def __sanitize_here_everyone(self, text):
-        text = re.sub('@here', '@\u180Ehere', text)
-        text = re.sub('@everyone', '@\u180Eeveryone', text)
-        return text
-
-    def __sanitize_special_chars(self, text):
-        text = re.sub('@', '\\@', text)
-        text = re.sub('~~', '\\~\\~', text)
-        text = re.sub('\*', '\\*', text)
-        text = re.sub('`', '\\`', text)
-        text = re.sub('_', '\\_', text)
-        return text.strip()
+    def __sanitize(self, message: discord.Message, text):
+        return sanitize(text,
+                        members={m.id: m.nick if m.nick is not None else m.name for m in message.mentions},
+                        channels={c.id: c.name for c in message.channel_mentions},
+                        roles={r.id: r.name for r in message.role_mentions})
@@ -0,0 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class ChannelLocks:
+    """
+    One asyncio lock per channel, so commands on a channel's game run one at a time while other channels
+    carry on. A lock is created the first time its channel is used and dropped again as soon as nothing
+    holds or waits on it, so the registry only ever holds channels with commands in flight.
+    """
+
+    def __init__(self):
+        # channel_id -> [lock, number of holders and waiters]
+        self.__locks = {}
+
+    def __len__(self):
+        return len(self.__locks)
+
+    def locked(self, channel_id):
+        entry = self.__locks.get(channel_id)
+        return entry is not None and entry[0].locked()
+
+    @asynccontextmanager
+    async def hold(self, channel_id):
+        entry = self.__locks.get(channel_id)
+        if entry is None:
+            entry = self.__locks[channel_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.__locks[channel_id]
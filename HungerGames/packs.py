@@ -0,0 +1,340 @@
+import hashlib
+import json
+import pickle
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+from .compiler import CompiledEvent
+from .enums import RoundType
+from .player import Pronouns
+from .template import MessageTemplate
+
+DEFAULT_EVENTS = Path(__file__).parent / "data" / "events.json"
+
+# round types that draw from the pack, the fallen round only lists the dead
+PACK_ROUND_TYPES = [r.value for r in RoundType if r is not RoundType.FALLEN]
+
+# attributes a message can use, as in {0.pronounRef}. Only the text ones: counts, flags and keys
+# would put a tribute's internals into the story.
+PLAYER_FIELDS = frozenset(('name', 'genderRef') + Pronouns._fields)
+
+# bump when the compact form or its validation changes so stale cache files are not read
+COMPACT_VERSION = 4
+
+
+class EventPackError(ValueError):
+    pass
+
+
+class EventPack:
+    """
+    The events of every round type, kept in the compact form produced by `compile_pack` until a round
+    type is first drawn from, when its events are built into CompiledEvents.
+
+    pack[round_type] - The CompiledEvent of the round type, or a list of them for the arena.
+    """
+
+    def __init__(self, digest, compact):
+        self.digest = digest
+        self.__compact = compact
+        self.__events = {}
+
+    def __contains__(self, round_type):
+        return round_type in self.__compact
+
+    def __getitem__(self, round_type):
+        event = self.__events.get(round_type)
+        if event is None:
+            compact = self.__compact[round_type]
+            if isinstance(compact, list):
+                event = [_materialize(e) for e in compact]
+            else:
+                event = _materialize(compact)
+            self.__events[round_type] = event
+        return event
+
+
+def _materialize(compact):
+    title, description, color, fatal, nonfatal = compact
+    return CompiledEvent({
+        'title': title,
+        'description': description,
+        'color': color,
+        'fatal': [_action(a) for a in fatal],
+        'nonfatal': [_action(a) for a in nonfatal]
+    })
+
+
+def _action(compact):
+    msg, tributes, killer, killed = compact
+    return {'msg': msg, 'tributes': tributes, 'killer': killer, 'killed': killed, 'kills': len(killed)}
+
+
+def compile_pack(events):
+    """
+    Validates the events of a pack and returns their compact form: for each round type an event tuple
+    (title, description, color, fatal, nonfatal), or a list of them for the arena, with every action a
+    tuple (msg, tributes, killer, killed). killer and killed are tuples of tribute slots, empty when the
+    action has no killer or kills nobody.
+    Raises EventPackError describing the first problem found.
+    """
+    if not isinstance(events, dict):
+        raise EventPackError("an event pack must be an object of round types")
+
+    compact = {}
+    for round_type in PACK_ROUND_TYPES:
+        if round_type not in events:
+            raise EventPackError("missing round type '{0}'".format(round_type))
+        event = events[round_type]
+        if round_type == RoundType.ARENA.value:
+            if not isinstance(event, list) or len(event) == 0:
+                raise EventPackError("'arena' must be a non-empty list of events")
+            compact[round_type] = [_compile_event(e, "arena[{0}]".format(i)) for i, e in enumerate(event)]
+        else:
+            compact[round_type] = _compile_event(event, round_type)
+    return compact
+
+
+def _compile_event(event, where):
+    if not isinstance(event, dict):
+        raise EventPackError("{0} must be an object".format(where))
+    if not isinstance(event.get('title'), str):
+        raise EventPackError("{0}.title must be a string".format(where))
+    try:
+        # the title is formatted with the day number when its round is played
+        event['title'].format(1)
+    except (IndexError, KeyError, ValueError, AttributeError, TypeError) as e:
+        raise EventPackError("{0}.title must only use {{0}} for the day: {1!r}".format(where, e))
+    if not isinstance(event.get('description'), (str, type(None))):
+        raise EventPackError("{0}.description must be a string or null".format(where))
+    fatal = _compile_actions(event, 'fatal', where)
+    nonfatal = _compile_actions(event, 'nonfatal', where)
+    # a round hands out actions until every tribute has acted and must never be left without a choice
+    if not any(tributes == 1 for _, tributes, _, _ in nonfatal):
+        raise EventPackError("{0}.nonfatal needs an action for a single tribute".format(where))
+    if not any(len(killed) == 1 for _, _, _, killed in fatal):
+        raise EventPackError("{0}.fatal needs an action that kills a single tribute".format(where))
+    return (event['title'], event.get('description'), _color(event.get('color'), where), fatal, nonfatal)
+
+
+def _color(color, where):
+    if isinstance(color, str) and color.startswith('#'):
+        try:
+            return int(color[1:], 16)
+        except ValueError:
+            pass
+    elif isinstance(color, int) and not isinstance(color, bool):
+        return color
+    raise EventPackError("{0}.color must be an integer or a '#rrggbb' string".format(where))
+
+
+def _compile_actions(event, kind, where):
+    actions = event.get(kind)
+    if not isinstance(actions, list) or len(actions) == 0:
+        raise EventPackError("{0}.{1} must be a non-empty list of actions".format(where, kind))
+
+    compact = []
+    for i, action in enumerate(actions):
+        at = "{0}.{1}[{2}]".format(where, kind, i)
+        if not isinstance(action, dict) or not isinstance(action.get('msg'), str):
+            raise EventPackError("{0} must be an object with a 'msg' string".format(at))
+        tributes = action.get('tributes')
+        if not isinstance(tributes, int) or isinstance(tributes, bool) or tributes < 1:
+            raise EventPackError("{0}.tributes must be a positive integer".format(at))
+
+        try:
+            template = MessageTemplate(action['msg'])
+        except ValueError as e:
+            raise EventPackError("{0}.msg: {1}".format(at, e))
+        for slot, attr in template.fields:
+            if slot >= tributes:
+                raise EventPackError("{0}.msg uses {{{1}}} but the action only has {2} tributes"
+                                     .format(at, slot, tributes))
+            if attr and attr not in PLAYER_FIELDS:
+                raise EventPackError("{0}.msg uses unknown attribute '{1}'".format(at, attr))
+
+        if kind == 'fatal':
+            for key in ('killer', 'killed'):
+                if key not in action:
+                    raise EventPackError("{0} is fatal but has no '{1}' (use null for none)".format(at, key))
+            killer = _slots(action['killer'], tributes, at, 'killer')
+            killed = _slots(action['killed'], tributes, at, 'killed')
+            if len(killed) == 0:
+                raise EventPackError("{0} is fatal but kills nobody".format(at))
+            if set(killer) & set(killed):
+                raise EventPackError("{0} has a tribute that is both killer and killed".format(at))
+        else:
+            if action.get('killer') is not None or action.get('killed') is not None:
+                raise EventPackError("{0} is non-fatal but has a killer or killed".format(at))
+            killer = killed = ()
+        compact.append((action['msg'], tributes, killer, killed))
+    return tuple(compact)
+
+
+def _slots(slots, tributes, at, key):
+    if slots is None:
+        return ()
+    if not isinstance(slots, list) or not all(isinstance(s, int) and not isinstance(s, bool) for s in slots):
+        raise EventPackError("{0}.{1} must be a list of tribute indexes".format(at, key))
+    for s in slots:
+        if not 0 <= s < tributes:
+            raise EventPackError("{0}.{1} has tribute {2} but the action only has {3} tributes"
+                                 .format(at, key, s, tributes))
+    if len(set(slots)) != len(slots):
+        raise EventPackError("{0}.{1} lists a tribute more than once".format(at, key))
+    return tuple(slots)
+
+
+def _compile_bytes(data, digest, cache_dir=None):
+    """
+    Returns the compact form of the pack file contents `data`, read from the pickle cached under
+    `cache_dir` for `digest` when there is one, otherwise validated and then cached.
+    """
+    cache_file = Path(cache_dir) / "{0}.v{1}.pickle".format(digest, COMPACT_VERSION) if cache_dir else None
+    if cache_file is not None:
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    try:
+        events = json.loads(data.decode('utf-8'))
+    except ValueError as e:
+        raise EventPackError("not valid JSON: {0}".format(e))
+    compact = compile_pack(events)
+    if cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, 'wb') as f:
+                pickle.dump(compact, f, pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+    return compact
+
+
+# digest -> EventPack, shared by everything loading the same content
+_packs = {}
+
+
+def load_pack(path, cache_dir=None):
+    """
+    Loads the event pack at `path`. Packs are keyed by the sha256 of their file, so unchanged content is
+    only validated once: the compact form is kept in memory and, with `cache_dir`, pickled there to be
+    read back instead of revalidating after a reload.
+    """
+    data = Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    pack = _packs.get(digest)
+    if pack is None:
+        pack = EventPack(digest, _compile_bytes(data, digest, cache_dir))
+        _packs[digest] = pack
+    return pack
+
+
+_default = None
+
+
+def default_pack(cache_dir=None):
+    """
+    The pack shipped in data/events.json, loaded the first time it is asked for.
+    """
+    global _default
+    if _default is None:
+        _default = load_pack(DEFAULT_EVENTS, cache_dir)
+    return _default
+
+
+class PackStore:
+    """
+    Event packs registered by guilds.
+
+    A pack is saved as <digest>.json under `path`, named by the sha256 of its contents, and
+    <guild_id>.pack holds the digest of the pack a guild currently uses. Replacing a guild's pack leaves
+    the old file in place so games saved with it can still be restored.
+
+    Packs are compiled the first time they are used and the `capacity` most recently used are kept in
+    an LRU shared by every game, so guilds using the same pack share one copy. A game keeps the pack it
+    was created with; an evicted pack a game still holds is found again by digest instead of recompiled.
+    """
+
+    def __init__(self, path, capacity=32):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.__lru = OrderedDict()
+        self.__live = weakref.WeakValueDictionary()
+        # guild_id -> digest of its pack, None for the default pack
+        self.__guilds = {}
+
+    def __pointer(self, guild_id):
+        return self.path / "{0}.pack".format(guild_id)
+
+    def __cache(self, pack):
+        self.__lru[pack.digest] = pack
+        self.__lru.move_to_end(pack.digest)
+        self.__live[pack.digest] = pack
+        while len(self.__lru) > self.capacity:
+            self.__lru.popitem(last=False)
+
+    def get(self, digest):
+        """
+        Returns the pack with `digest`, compiling it if needed, or None if no such pack was ever saved.
+        """
+        if digest is None or digest == default_pack().digest:
+            return default_pack()
+        pack = self.__lru.get(digest)
+        if pack is None:
+            pack = self.__live.get(digest)
+        if pack is None:
+            try:
+                data = (self.path / "{0}.json".format(digest)).read_bytes()
+            except FileNotFoundError:
+                return None
+            pack = EventPack(digest, _compile_bytes(data, digest, self.path / "cache"))
+        self.__cache(pack)
+        return pack
+
+    def digest_for(self, guild_id):
+        if guild_id not in self.__guilds:
+            try:
+                self.__guilds[guild_id] = self.__pointer(guild_id).read_text(encoding='ascii').strip()
+            except FileNotFoundError:
+                self.__guilds[guild_id] = None
+        return self.__guilds[guild_id]
+
+    def for_guild(self, guild_id):
+        """
+        The pack new games in the guild are played with, the default pack unless the guild set its own.
+        """
+        pack = self.get(self.digest_for(guild_id))
+        return pack if pack is not None else default_pack()
+
+    def register(self, guild_id, data: bytes):
+        """
+        Validates the pack file contents `data` and makes it the guild's pack.
+        Raises EventPackError if the pack is invalid.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        pack = self.__lru.get(digest) or self.__live.get(digest)
+        if pack is None:
+            pack = EventPack(digest, _compile_bytes(data, digest, self.path / "cache"))
+        path = self.path / "{0}.json".format(digest)
+        if not path.exists():
+            path.write_bytes(data)
+        self.__pointer(guild_id).write_text(digest, encoding='ascii')
+        self.__guilds[guild_id] = digest
+        self.__cache(pack)
+        return pack
+
+    def reset(self, guild_id):
+        """
+        Returns the guild to the default pack. Returns False if it was already using it.
+        """
+        self.__guilds[guild_id] = None
+        try:
+            self.__pointer(guild_id).unlink()
+        except FileNotFoundError:
+            return False
+        return True
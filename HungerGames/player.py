@@ -1,111 +1,99 @@
+from collections import namedtuple
+
 from .enums import GenderEnum
 
+Pronouns = namedtuple('Pronouns', ['pronoun', 'pronounCap', 'pronounRef', 'pronounRefCap', 'pronounSelf',
+                                   'pronounSelfCap', 'pronounOwn', 'pronounOwnCap'])
+
+
+def _pronouns(subject: str, ref: str, reflexive: str, own: str):
+    return Pronouns(subject, subject.capitalize(), ref, ref.capitalize(), reflexive, reflexive.capitalize(),
+                    own, own.capitalize())
+
+
+# Every form is resolved once per gender and shared by all players of that gender
+PRONOUNS = {
+    GenderEnum.MALE: _pronouns("he", "him", "himself", "his"),
+    GenderEnum.FEMALE: _pronouns("she", "her", "herself", "her"),
+    GenderEnum.OTHER: _pronouns("they", "them", "themself", "their"),
+}
+
+
 class Player:
+    __slots__ = ('name', 'district', 'genderEnum', 'genderRef', 'alive', 'kills', 'cause_of_death',
+                 '__pronouns', '__key', '__hash')
+
     def __init__(self, name: str, district: int, gender: GenderEnum = GenderEnum.OTHER):
         self.name: str = name
         self.district: int = district
-        self.genderEnum: GenderEnum = gender;
+        self.genderEnum: GenderEnum = gender
         self.genderRef: str = gender.value
         self.alive: bool = True
         self.kills: int = 0
         self.cause_of_death: str = ""
+        self.__pronouns: Pronouns = PRONOUNS[gender]
+        # name, district and gender never change, so the ordering key and hash are built once
+        self.__key = (district, self.genderRef, name)
+        self.__hash = hash(self.__key)
 
     def __str__(self):
         return self.name
 
+    @property
+    def sort_key(self):
+        return self.__key
+
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.name == other.name and self.district == other.district and self.genderRef == other.genderRef
+            return self.__key == other.__key
         return False
 
     def __ne__(self, other):
-        return self.name != other.name or self.district != other.district or self.genderRef != other.genderRef
+        return self.__key != other.__key
 
     def __lt__(self, other):
-        return (self.district, self.genderRef, self.name) < (other.district, other.genderRef, other.name)
+        return self.__key < other.__key
 
     def __le__(self, other):
-        return (self.district, self.genderRef, self.name) <= (other.district, other.genderRef, other.name)
+        return self.__key <= other.__key
 
     def __gt__(self, other):
-        return (self.district, self.genderRef, self.name) > (other.district, other.genderRef, other.name)
+        return self.__key > other.__key
 
     def __ge__(self, other):
-        return (self.district, self.genderRef, self.name) >= (other.district, other.genderRef, other.name)
+        return self.__key >= other.__key
 
     def __hash__(self):
-        return hash((self.district, self.genderRef, self.name))
+        return self.__hash
 
     @property
     def pronoun(self):
-        return self.genderRef
+        return self.__pronouns.pronoun
 
     @property
     def pronounCap(self):
-        return self.genderRef.capitalize()
+        return self.__pronouns.pronounCap
 
     @property
     def pronounRef(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "him"
-        elif (self.genderRef == "she"):
-            ref = "her"
-        else:
-            ref = "them"
-        return ref
+        return self.__pronouns.pronounRef
 
     @property
     def pronounRefCap(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "him"
-        elif (self.genderRef == "she"):
-            ref = "her"
-        else:
-            ref = "them"
-        return ref.capitalize()
+        return self.__pronouns.pronounRefCap
 
     @property
     def pronounSelf(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "himself"
-        elif (self.genderRef == "she"):
-            ref = "herself"
-        else:
-            ref = "themself"
-        return ref
+        return self.__pronouns.pronounSelf
 
     @property
     def pronounSelfCap(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "himself"
-        elif (self.genderRef == "she"):
-            ref = "herself"
-        else:
-            ref = "themself"
-        return ref.capitalize()
+        return self.__pronouns.pronounSelfCap
 
     @property
     def pronounOwn(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "his"
-        elif (self.genderRef == "she"):
-            ref = "her"
-        else:
-            ref = "their"
-        return ref
+        return self.__pronouns.pronounOwn
 
     @property
     def pronounOwnCap(self):
-        ref: str = None
-        if(self.genderRef == "he"):
-            ref = "his"
-        elif (self.genderRef == "she"):
-            ref = "her"
-        else:
-            ref = "their"
-        return ref.capitalize()
\ No newline at end of file
+        return self.__pronouns.pronounOwnCap
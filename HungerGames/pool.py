@@ -0,0 +1,70 @@
+import itertools
+import math
+import random
+
+
+class TributePool:
+    """
+    The tributes that have not yet acted in the current round.
+
+    Tributes are kept in a list alongside a position index so that a random
+    draw and a removal are both O(1): the removed slot is filled by swapping
+    in the last tribute.
+    """
+
+    def __init__(self, players=()):
+        self.__items = list(players)
+        self.__index = {p: i for i, p in enumerate(self.__items)}
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __bool__(self):
+        return len(self.__items) > 0
+
+    def __contains__(self, player):
+        return player in self.__index
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def remove(self, player):
+        self.__take(self.__index[player])
+
+    def pop_random(self, rng=random):
+        return self.__take(rng.randrange(len(self.__items)))
+
+    def __take(self, i):
+        items = self.__items
+        player = items[i]
+        last = items.pop()
+        if last is not player:
+            items[i] = last
+            self.__index[last] = i
+        del self.__index[player]
+        return player
+
+
+def reservoir_sample(iterable, k, rng=random):
+    """
+    Up to `k` items drawn uniformly without replacement from `iterable`, in random order.
+
+    The iterable is read once and never copied. Items that are passed over are skipped with islice
+    (Li's Algorithm L), so only about k * log(n / k) random numbers are drawn for n items.
+    """
+    it = iter(iterable)
+    reservoir = list(itertools.islice(it, k))
+    if k > 0 and len(reservoir) == k:
+        w = math.exp(math.log(1.0 - rng.random()) / k)
+        while True:
+            skip = math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - w))
+            chosen = next(itertools.islice(it, skip, None), _END)
+            if chosen is _END:
+                break
+            reservoir[rng.randrange(k)] = chosen
+            w *= math.exp(math.log(1.0 - rng.random()) / k)
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+_END = object()
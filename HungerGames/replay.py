@@ -0,0 +1,45 @@
+class ReplayLog:
+    """
+    The choices made while playing a game: round types, arena events, actions and the roster slots of
+    the tributes picked for them. Values are stored as varints, so a whole game only takes a few hundred
+    bytes and can be replayed without keeping any message text.
+    """
+
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def write(self, value: int):
+        while value > 0x7f:
+            self.data.append((value & 0x7f) | 0x80)
+            value >>= 7
+        self.data.append(value)
+
+    def reader(self, start: int = 0):
+        return ReplayReader(bytes(self.data), start)
+
+
+class ReplayReader:
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    @property
+    def exhausted(self):
+        return self.pos >= len(self.data)
+
+    def read(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
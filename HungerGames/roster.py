@@ -0,0 +1,34 @@
+from bisect import bisect_left
+
+
+class RosterIndex:
+    """
+    Players kept in Player.sort_key order. Insertion and removal locate the player by bisecting a
+    parallel list of keys, so the order never has to be rebuilt with a sort.
+    """
+
+    def __init__(self, players=()):
+        self.__players = sorted(players, key=lambda p: p.sort_key)
+        self.__keys = [p.sort_key for p in self.__players]
+
+    def __len__(self):
+        return len(self.__players)
+
+    def __iter__(self):
+        return iter(self.__players)
+
+    def __getitem__(self, i):
+        return self.__players[i]
+
+    def add(self, player):
+        i = bisect_left(self.__keys, player.sort_key)
+        self.__keys.insert(i, player.sort_key)
+        self.__players.insert(i, player)
+
+    def remove(self, player):
+        i = bisect_left(self.__keys, player.sort_key)
+        if i < len(self.__players) and self.__players[i] is player:
+            del self.__keys[i]
+            del self.__players[i]
+            return True
+        return False
@@ -0,0 +1,48 @@
+import re
+
+# Every token sanitizing rewrites, matched in one scan: user, channel and role mentions, @here/@everyone,
+# and the markdown characters that get escaped.
+_TOKENS = re.compile(r"<@!?(\d+)>|<#(\d+)>|<@&(\d+)>|@(here|everyone)|~~|[@*`_]")
+_ESCAPES = re.compile(r"@(here|everyone)|~~|[@*`_]")
+
+
+def _escape_token(match):
+    if match.group(1) is not None:
+        # the separator keeps Discord from pinging, the escape keeps the @ from rendering as markdown
+        return "\\@\u180E" + match.group(1)
+    token = match.group(0)
+    if token == "~~":
+        return "\\~\\~"
+    return "\\" + token
+
+
+def escape(text):
+    return _ESCAPES.sub(_escape_token, text)
+
+
+def sanitize(text, members=None, channels=None, roles=None):
+    """
+    Makes user-supplied text safe to show in messages and embeds.
+
+    Mentions of the members, channels and roles given as {id: name} are replaced by their (escaped) names,
+    @here and @everyone are neutralised and @ * ` _ ~~ are escaped, all in a single pass over `text`.
+    Leading and trailing whitespace is trimmed.
+    """
+    members = members or {}
+    channels = channels or {}
+    roles = roles or {}
+
+    def replace(match):
+        member, channel, role, _ = match.group(1, 2, 3, 4)
+        if member is not None:
+            name = members.get(int(member))
+        elif channel is not None:
+            name = channels.get(int(channel))
+        elif role is not None:
+            name = roles.get(int(role))
+        else:
+            return escape(match.group(0))
+        # a mention of something not in the message is left as text, escaped like the rest
+        return escape(name if name is not None else match.group(0))
+
+    return _TOKENS.sub(replace, text).strip()
@@ -0,0 +1,125 @@
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .game import Game
+from .player import Player
+from .packs import load_pack
+
+
+class SimulationReport:
+    """
+    Aggregated results of a batch of headless games.
+
+    rounds_to_winner - Rounds played before the game ended -> number of games
+    kills_per_tribute - Kills by a single tribute in a game -> number of tributes
+    winner_kills - Kills by the winner of a game -> number of games
+    event_usage - Event title -> number of rounds it was picked for
+    action_usage - (event title, action message) -> number of times it was picked
+    deaths_by_round_type - Round type -> number of tributes killed in it
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.all_dead = 0
+        self.rounds_to_winner = Counter()
+        self.kills_per_tribute = Counter()
+        self.winner_kills = Counter()
+        self.event_usage = Counter()
+        self.action_usage = Counter()
+        self.deaths_by_round_type = Counter()
+
+    def merge(self, other):
+        self.games += other.games
+        self.all_dead += other.all_dead
+        self.rounds_to_winner.update(other.rounds_to_winner)
+        self.kills_per_tribute.update(other.kills_per_tribute)
+        self.winner_kills.update(other.winner_kills)
+        self.event_usage.update(other.event_usage)
+        self.action_usage.update(other.action_usage)
+        self.deaths_by_round_type.update(other.deaths_by_round_type)
+        return self
+
+    @property
+    def mean_rounds(self):
+        if self.games == 0:
+            return 0.0
+        return sum(r * n for r, n in self.rounds_to_winner.items()) / self.games
+
+    def record(self, game, rounds):
+        self.games += 1
+        self.rounds_to_winner[rounds] += 1
+        winner = None
+        for p in game.players.values():
+            self.kills_per_tribute[p.kills] += 1
+            if p.alive:
+                winner = p
+        if winner is None:
+            self.all_dead += 1
+        else:
+            self.winner_kills[winner.kills] += 1
+
+
+def play(report, tributes, seed=None, max_rounds=1000, pack=None):
+    """
+    Plays a single game with `tributes` generated tributes to completion and records it in `report`.
+    """
+    game = Game("Simulator", None, "Simulation", seed, pack)
+    for i in range(tributes):
+        game.add_player(Player("Tribute {0}".format(i + 1), i // 2 + 1))
+    game.start()
+
+    rounds = 0
+    while rounds < max_rounds:
+        alive = game.total_players_alive
+        summary = game.step()
+        if summary.get('winner') is not None or summary.get('allDead') is not None:
+            break
+        rounds += 1
+        report.deaths_by_round_type[summary['roundType']] += alive - game.total_players_alive
+        event = summary.get('event')
+        if event is not None:
+            report.event_usage[event] += 1
+            for action in summary['actions']:
+                report.action_usage[(event, action['msg'])] += 1
+    report.record(game, rounds)
+
+
+def _simulate_chunk(games, tributes, seed, pack_path):
+    pack = load_pack(pack_path) if pack_path is not None else None
+    seeder = random.Random(seed)
+    report = SimulationReport()
+    for _ in range(games):
+        play(report, tributes, seeder.getrandbits(64), pack=pack)
+    return report
+
+
+def simulate(games: int = 1000, tributes: int = 24, processes: int = None, chunk_size: int = 250, seed=None,
+             pack_path=None):
+    """
+    Runs `games` complete games of `tributes` tributes without Discord and returns a merged SimulationReport.
+    Games use the event pack file at `pack_path`, or the default pack.
+
+    Games are split into chunks of `chunk_size` and spread over a process pool of `processes` workers
+    (defaults to the CPU count). Use processes=1 to run in the calling process.
+    Passing a seed makes the whole batch reproducible for the same chunk size.
+    """
+    seeder = random.Random(seed)
+    chunks = []
+    remaining = games
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        chunks.append((n, tributes, seeder.getrandbits(64), pack_path))
+        remaining -= n
+
+    report = SimulationReport()
+    if processes == 1:
+        for chunk in chunks:
+            report.merge(_simulate_chunk(*chunk))
+        return report
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_simulate_chunk, *chunk) for chunk in chunks]
+        for future in futures:
+            report.merge(future.result())
+    return report
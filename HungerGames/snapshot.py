@@ -0,0 +1,140 @@
+import base64
+import json
+import os
+
+from .enums import GenderEnum
+from .game import Game
+from .packs import default_pack
+from .player import Player
+from .replay import ReplayLog
+
+
+class SnapshotStore:
+    """
+    Persists games as one JSON-lines file per channel so they survive bot restarts and cog reloads.
+
+    Every change to a game is appended as a single record rather than rewriting the game:
+        {"op": "new", "owner_name": ..., "owner_id": ..., "title": ..., "seed": ..., "pack": <digest>,
+         "max_players": ...}
+        {"op": "add", "player": [name, district, gender]}
+        {"op": "remove", "name": ...}
+        {"op": "start"}
+        {"op": "round", "log": <base64 replay log bytes written by the round>}
+
+    Nothing is read at startup; a game is only restored, by replaying its records, the first time its
+    channel is used. A record cut short by a crash is ignored on load.
+
+    packs - The PackStore games are restored with their event packs from. Without one, only games using the
+            default pack can be restored.
+    """
+
+    def __init__(self, path, packs=None):
+        self.path = str(path)
+        self.packs = packs
+        os.makedirs(self.path, exist_ok=True)
+        # length of each game's replay log that has already been written
+        self.__written = {}
+
+    def __file(self, channel_id):
+        return os.path.join(self.path, "{0}.jsonl".format(channel_id))
+
+    def __append(self, channel_id, *records):
+        with open(self.__file(channel_id), 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(record, separators=(',', ':')) + "\n" for record in records))
+
+    def create(self, channel_id, game: Game):
+        self.delete(channel_id)
+        self.__append(channel_id, {'op': 'new', 'owner_name': game.owner_name, 'owner_id': game.owner_id,
+                                   'title': game.title, 'seed': game.seed, 'pack': game.pack.digest,
+                                   'max_players': game.max_players})
+
+    def add_players(self, channel_id, players):
+        """
+        Saves the tributes added to the game, appending all of their records in one write.
+        """
+        self.__append(channel_id, *({'op': 'add', 'player': [p.name, p.district, p.genderEnum.name]} for p in players))
+
+    def remove_player(self, channel_id, name):
+        self.__append(channel_id, {'op': 'remove', 'name': name})
+
+    def start(self, channel_id, game: Game):
+        self.__append(channel_id, {'op': 'start'})
+        self.__written[channel_id] = len(game.log)
+
+    def round(self, channel_id, game: Game):
+        start = self.__written.get(channel_id, 0)
+        data = bytes(game.log.data[start:])
+        self.__append(channel_id, {'op': 'round', 'log': base64.b64encode(data).decode('ascii')})
+        self.__written[channel_id] = len(game.log)
+
+    def delete(self, channel_id):
+        self.__written.pop(channel_id, None)
+        try:
+            os.remove(self.__file(channel_id))
+        except FileNotFoundError:
+            pass
+
+    def __pack(self, digest):
+        if self.packs is not None:
+            return self.packs.get(digest)
+        if digest is None or digest == default_pack().digest:
+            return default_pack()
+        return None
+
+    def load(self, channel_id):
+        """
+        Restores the game saved for `channel_id`, or returns None if there is none.
+        """
+        path = self.__file(channel_id)
+        try:
+            with open(path, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+
+        records = []
+        size = 0
+        for line in lines:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError
+                records.append(json.loads(line))
+            except ValueError:
+                # the last record was cut short, drop it so later records are appended cleanly
+                os.truncate(path, size)
+                break
+            size += len(line)
+        if len(records) == 0 or records[0]['op'] != 'new':
+            return None
+
+        header = records[0]
+        pack = self.__pack(header.get('pack'))
+        if pack is None:
+            # the pack the game was played with is gone, so its rounds can't be replayed
+            return None
+        game = Game(header['owner_name'], header['owner_id'], header['title'], header['seed'], pack,
+                    header.get('max_players', 24))
+        rounds = []
+        started = False
+        for record in records[1:]:
+            op = record['op']
+            if op == 'add':
+                name, district, gender = record['player']
+                game.add_player(Player(name, district, GenderEnum[gender]))
+            elif op == 'remove':
+                game.remove_player(record['name'])
+            elif op == 'start':
+                game.start()
+                started = True
+            elif op == 'round':
+                rounds.append(base64.b64decode(record['log']))
+
+        if started:
+            game.log = ReplayLog(b"".join(rounds))
+            reader = game.log.reader()
+            while not reader.exhausted:
+                game.replay_step(reader, render=False)
+            # The generator state is not saved, so continue from a stream derived from the seed instead
+            game.rng.seed(game.seed + len(game.log))
+        self.__written[channel_id] = len(game.log)
+        return game
@@ -0,0 +1,56 @@
+from operator import attrgetter
+from string import Formatter
+
+
+def _format(value):
+    # what str.format does with a field that has no spec, so an int or enum renders the same way
+    return format(value, '')
+
+
+def _formatted(get):
+    return lambda player: format(get(player), '')
+
+
+class MessageTemplate:
+    """
+    An action message parsed once into literal chunks and tribute lookups.
+
+    render(players) gives the same string as msg.format(*players) for the
+    `{0}` and `{0.attribute}` fields used by the event packs, without parsing
+    the message again on every use.
+    """
+
+    def __init__(self, msg: str):
+        self.msg = msg
+        parts = []
+        fields = []
+        pending = ""
+        for literal, field, spec, conversion in Formatter().parse(msg):
+            pending += literal
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError("Unsupported field '{{{0}}}' in message: {1}".format(field, msg))
+            slot, _, attr = field.partition('.')
+            if not slot.isdigit() or '.' in attr or '[' in field:
+                raise ValueError("Unsupported field '{{{0}}}' in message: {1}".format(field, msg))
+            getter = _formatted(attrgetter(attr)) if attr else _format
+            fields.append((int(slot), attr))
+            parts.append((pending, int(slot), getter))
+            pending = ""
+        self.__parts = tuple(parts)
+        self.__tail = pending
+        # (slot, attribute) of every field, attribute is "" for a bare {0}
+        self.fields = tuple(fields)
+        self.slots = max((slot for _, slot, _ in parts), default=-1) + 1
+
+    def __str__(self):
+        return self.msg
+
+    def render(self, players):
+        out = []
+        for literal, slot, getter in self.__parts:
+            out.append(literal)
+            out.append(getter(players[slot]))
+        out.append(self.__tail)
+        return "".join(out)
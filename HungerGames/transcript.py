@@ -0,0 +1,71 @@
+from collections.abc import Sequence
+
+from .game import Game
+
+
+def format_round(summary):
+    """
+    Turns the summary of a played round into the title, color, description and footer of its message.
+    """
+    if summary['description'] is not None and len(summary['messages']) > 0:
+        formatted_msg = "{0}\n\n> {1}".format(summary['description'], "\n> ".join(summary['messages']))
+    elif summary['description'] is not None:
+        formatted_msg = summary['description']
+    else:
+        formatted_msg = "> {0}".format("\n> ".join(summary['messages']))
+
+    return {
+        'title': summary['title'],
+        'color': summary['color'],
+        'description': formatted_msg,
+        'footer': summary['footer']
+    }
+
+
+class Transcript(Sequence):
+    """
+    One page per round of a game played to its end, followed by the result page.
+
+    Rounds are not kept once played. A page is regenerated from the game's roster and replay log the
+    first time it is viewed, so only the pages someone actually flips to are ever rendered. Rounds
+    between the last rendered page and the one viewed are replayed without building their messages.
+
+    render - Converts a formatted round into the page object handed out, e.g. an embed.
+    """
+
+    def __init__(self, game: Game, first_round: int, result, render=None):
+        self.__replay = Game.from_roster(game.owner_name, game.owner_id, game.title, game.roster(), game.pack)
+        self.__reader = game.log.reader()
+        self.__first_round = first_round
+        self.__rounds = game.rounds - first_round
+        self.__result = result
+        self.__render = render if render is not None else (lambda page: page)
+        self.__pages = {}
+
+    def __len__(self):
+        return self.__rounds + 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transcript page out of range")
+
+        if i not in self.__pages:
+            if i == self.__rounds:
+                self.__pages[i] = self.__render(self.__result)
+            else:
+                self.__pages[i] = self.__render(format_round(self.__round(self.__first_round + i)))
+        return self.__pages[i]
+
+    def __round(self, number):
+        if number < self.__replay.rounds:
+            # an earlier round than the replay has reached, start it over
+            self.__replay = Game.from_roster(self.__replay.owner_name, self.__replay.owner_id,
+                                             self.__replay.title, self.__replay.roster(), self.__replay.pack)
+            self.__reader.pos = 0
+        while self.__replay.rounds < number:
+            self.__replay.replay_step(self.__reader, render=False)
+        return self.__replay.replay_step(self.__reader)
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+
+class Database:
+    """
+    Runs units of work against the MatchMaker database off the event loop.
+
+    A unit of work is a function taking a session as its first argument. Each one gets a session of its
+    own, committed when the function returns and rolled back if it raises. Units of work should return
+    plain data rather than ORM objects, since their session is closed once they finish.
+
+    Units that only read go through run and share a bounded pool of threads. Units that write go through
+    write, one at a time on a thread of their own, and start with BEGIN IMMEDIATE. Each one's checks and
+    changes (a lobby with a free slot, a game not yet ended) therefore happen with no other writer in
+    between. The database is in WAL mode so reads carry on while a write commits.
+    """
+
+    # seconds a connection waits on a lock held by another connection (e.g. a second bot process)
+    BUSY_TIMEOUT = 30
+
+    def __init__(self, url, max_workers=4):
+        # sessions are opened on the pool's threads, not the one that created the engine
+        self.engine = create_engine(url, echo=False,
+                                    connect_args={'check_same_thread': False, 'timeout': self.BUSY_TIMEOUT})
+        event.listen(self.engine, 'connect', self.__connect)
+        event.listen(self.engine, 'begin', self.__begin)
+        self.Session = sessionmaker(bind=self.engine)
+        self.WriteSession = sessionmaker(bind=self.engine.execution_options(immediate=True))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="matchmaker-db")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matchmaker-db-write")
+
+    @staticmethod
+    def __connect(dbapi_connection, connection_record):
+        # the driver would only BEGIN before the first write, leaving a unit's reads outside the transaction
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout={}".format(Database.BUSY_TIMEOUT * 1000))
+        cursor.close()
+
+    @staticmethod
+    def __begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get('immediate') else "BEGIN")
+
+    def run_sync(self, work, *args, write=False):
+        """
+        Runs a unit of work on the calling thread. Only for startup, before the bot is serving commands.
+        """
+        session = self.WriteSession() if write else self.Session()
+        try:
+            result = work(session, *args)
+            session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    async def run(self, work, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.run_sync, work, *args))
+
+    async def write(self, work, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.writer, functools.partial(self.run_sync, work, *args, write=True))
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.engine.dispose()
@@ -7,10 +7,10 @@ from redbot.core import data_manager
 
 from random import shuffle, choice, randrange
 import json
+import logging
 import traceback
 
-from sqlalchemy import create_engine, inspect, desc
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect, desc, func
 from sqlalchemy import any_
 
 from tabulate import tabulate
@@ -19,6 +19,13 @@ from tabulate import tabulate
 
 from .models import *
 from .enums import *
+from .database import Database
+from .migrations import migrate
+
+log = logging.getLogger("red.MatchMaker")
+
+# Ranks go by win rate, ties to whoever registered first
+RANK_ORDER = (desc(Score.WinRate), Score.id)
 
 class MatchMaker(commands.Cog):
     """Match Maker"""
@@ -26,43 +33,49 @@ class MatchMaker(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.queue = []
-        engine = create_engine('sqlite:///'+str(data_manager.bundled_data_path(self)) +'\\matchmaker-bot.db', echo=False)
-        Session = sessionmaker(bind=engine)
-        self.session = Session()
+        # All queries run through self.db on its own threads, one session per unit of work.
+        # Units that change anything go through self.db.write, which runs them one at a time.
+        self.db = Database('sqlite:///'+str(data_manager.bundled_data_path(self)) +'\\matchmaker-bot.db')
 
         self.GROUP = "mm"
 
+        # guildID -> (rows, pages) of the guild's leaderboard, rows being the rendered top
+        # LEADERBOARD_SIZE in rank order and pages the tables already made from them.
+        # Dropped by invalidateLeaderboard whenever a score in the guild changes.
+        self.LEADERBOARD_SIZE = 100
+        self.LEADERBOARD_PAGE = 25
+        self.leaderboards = {}
+        # guildID -> times its leaderboard was invalidated, so a board read before a change isn't cached after it
+        self.leaderboardVersions = {}
+
         self.SETTINGS = {}
 
         # If table doesn't exist, Create the database
-        if not inspect(engine).has_table('guild'):
-            Base.metadata.create_all(engine)
-
+        if not inspect(self.db.engine).has_table('guild'):
+            Base.metadata.create_all(self.db.engine)
+        migrate(self.db.engine, log)
 
         self.loadSettings()
+        self.db.run_sync(self.seedMaps, write=True)
 
         print("---MatchMaker Teams Started---")
-        all_guilds = self.bot.guilds
-        for gd in all_guilds:
-            g = self.session.query(Guild).filter(int(gd.id) == Guild.id).one_or_none()
-            if g is None:
-                g = Guild(id=int(gd.id))
-                self.session.add(g)
-            self.session.commit()
+        self.db.run_sync(self.registerGuilds, [int(gd.id) for gd in self.bot.guilds], write=True)
         ## ROLES ARE NOT INITIALIZED AND NEED TO BE CONFIGURED
         ## Will instead do checks for has admin rights, as well as add a list of roles?
         ## And also server owner for the settings folder open
 
-    def __del__(self):
-        if(self.session):
-            self.session.commit()
-            self.session.close()
+    def cog_unload(self):
+        self.db.close()
 
     @commands.Cog.listener()
     async def on_shutdown(self):
-        if(self.session):
-            self.session.commit()
-            self.session.close()
+        self.db.close()
+
+    def registerGuilds(self, session, guildIDs):
+        for guildID in guildIDs:
+            g = session.query(Guild).filter(guildID == Guild.id).one_or_none()
+            if g is None:
+                session.add(Guild(id=guildID))
 
     def loadSettings(self):
         with open(str(data_manager.bundled_data_path(self)) + "\\settings.json") as f:
@@ -72,34 +85,33 @@ class MatchMaker(commands.Cog):
         self.ROLES = self.SETTINGS['ROLES']
         self.MAPS = self.SETTINGS['MAPS']
 
+    def seedMaps(self, session):
+        # Adds the maps and map sets from the settings that are not in the database yet
         unique_maps = set([m for x in self.MAPS for m in self.MAPS[x]])
         for _map in unique_maps:
-            instance = self.session.query(Map).filter(Map.Name == _map).one_or_none()
+            instance = session.query(Map).filter(Map.Name == _map).one_or_none()
             if instance is None:
-                self.session.add(Map(Name=_map))
-                self.session.commit()
-
-        self.session.commit()
+                session.add(Map(Name=_map))
+        session.flush()
 
         for mode in self.MAPS:
-            mode_instance = self.session.query(MapSet).filter(MapSet.Name == mode).one_or_none()
+            mode_instance = session.query(MapSet).filter(MapSet.Name == mode).one_or_none()
             is_new_mode = False
             if mode_instance is None:
-                self.session.add(MapSet(Name=mode))
+                session.add(MapSet(Name=mode))
                 is_new_mode = True
 
             _maps = self.MAPS[mode]
             if (is_new_mode):
                 for _map in _maps:
-                    self.session.add(MapInfo(Set=mode, _Map=_map))
-                self.session.commit()
+                    session.add(MapInfo(Set=mode, _Map=_map))
             else:
                 for _map in _maps:
-                    instance = self.session.query(MapInfo).filter(MapInfo.Set == mode,
-                                                                  MapInfo._Map == _map).one_or_none()
+                    instance = session.query(MapInfo).filter(MapInfo.Set == mode,
+                                                             MapInfo._Map == _map).one_or_none()
                     if instance is None:
-                        self.session.add(MapInfo(Set=mode, _Map=_map))
-            self.session.commit()
+                        session.add(MapInfo(Set=mode, _Map=_map))
+            session.flush()
 
     @commands.group()
     async def mm(self, ctx):
@@ -137,6 +149,7 @@ class MatchMaker(commands.Cog):
     @commands.guild_only()
     async def reload(self, ctx):
         self.loadSettings()
+        await self.db.write(self.seedMaps)
         await ctx.send("Reloading Settings")
 
     @mod.command(name="getDBGuilds", brief="DEV - Get All Guilds")
@@ -145,12 +158,15 @@ class MatchMaker(commands.Cog):
         # Doing DB Query instead of bot api call
         # To help monitor health of DB
 
-        guilds = self.session.query(Guild).all()
+        guildIDs = await self.db.run(self.allGuildIDs)
         headers = ['Name','ID']
-        rows = [ (await self.getGuildNameByID(g.id), g.id) for g in guilds]
+        rows = [ (await self.getGuildNameByID(gid), gid) for gid in guildIDs]
         table = tabulate(rows, headers)
         await ctx.send('Current Guilds In DB:\n```\n'+table+'```')
 
+    def allGuildIDs(self, session):
+        return [g.id for g in session.query(Guild).all()]
+
     @mm.command(brief="List all Map Sets and available Maps", aliases=['mapsets','listmapsets','listMaps'],
                  description="View all map sets and associated maps")
     @commands.guild_only()
@@ -190,24 +206,27 @@ class MatchMaker(commands.Cog):
     async def registerUser(self, discordID, guild):
         msg = ""
         username = await self.getUsernameFromID(discordID);
-        user = self.session.query(User).filter(User.UserID == discordID, User.GuildID == guild.id).one_or_none()
-        if user is not None:
-            user.Username = username;
+        if not await self.db.write(self.addUser, discordID, guild.id):
             msg = "{} is already registered in server {}!".format(username, guild.name)
         else:
-            user = User(UserID=discordID, GuildID=guild.id);
-            score = Score(UserID = user.UserID, GuildID = user.GuildID)
-            self.session.add_all([user, score])
-            
             msg = "Registering new user {} for server {}".format(username, guild.name)
-
-        self.session.commit()
+            self.invalidateLeaderboard(guild.id)
         return msg
 
+    def addUser(self, session, discordID, guildID):
+        # Returns False if the user was already registered
+        user = session.query(User).filter(User.UserID == discordID, User.GuildID == guildID).one_or_none()
+        if user is not None:
+            return False
+        user = User(UserID=discordID, GuildID=guildID);
+        score = Score(UserID = user.UserID, GuildID = user.GuildID)
+        session.add_all([user, score])
+        return True
+
     @mm.group(name="lobby",description="Lobby Commands", brief="Lobby Commands")
     async def lobby(self, ctx: commands.Context):
         if ctx.invoked_subcommand is None:
-            activeLobby = self.checkActiveLobby(ctx.channel.id, ctx.guild.id);
+            activeLobby = await self.db.run(self.checkActiveLobby, ctx.channel.id, ctx.guild.id);
             if activeLobby is not None:
                 await self.sayLobbyInfo(ctx)
             else:
@@ -239,19 +258,16 @@ class MatchMaker(commands.Cog):
             await ctx.send("There will be one match with {} players, separated into two teams. Maps are random.".format(self.MAX_PLAYERS))
             channelID = ctx.message.channel.id
             guildID = ctx.message.guild.id
-            bl = self.session.query(BlacklistChannel).filter(BlacklistChannel.id == channelID, BlacklistChannel.GuildID == guildID).one_or_none()
-            if bl is not None:
-                await ctx.send("This channel is blacklisted from creating lobbies")
-                return
-            activeLobby = self.checkActiveLobby(channelID, guildID)
-            if activeLobby is not None:
-                await ctx.send("There is already an active lobby in this channel")
-                return
-
             pick = PickMode(pick).value
 
             try:
-                self.createEmptyLobby(channelID, guildID, pick)
+                blocked = await self.db.write(self.startLobby, channelID, guildID, pick)
+                if blocked == "blacklisted":
+                    await ctx.send("This channel is blacklisted from creating lobbies")
+                    return
+                if blocked == "active":
+                    await ctx.send("There is already an active lobby in this channel")
+                    return
                 await ctx.send("Lobby created! Join using {}lobby join. Up to {} players can join.\n"
                                .format(ctx.clean_prefix + self.GROUP + " ", self.MAX_PLAYERS))
                 await self.sayLobbyInfo(ctx)
@@ -267,23 +283,39 @@ class MatchMaker(commands.Cog):
             print(e)
 
 
-    def checkActiveLobby(self, channelID, guildID):
-        activeLobby = self.session.query(Lobby.Active).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-        return activeLobby
+    def startLobby(self, session, channelID, guildID, pickMode):
+        # Makes a lobby in the channel unless it is blocked, checked in the same write so two starts can't both pass
+        blocked = self.lobbyBlocked(session, channelID, guildID)
+        if blocked is None:
+            self.createEmptyLobby(session, channelID, guildID, pickMode)
+        return blocked
 
-    def createEmptyLobby(self, channelID, guildID, pickMode):
+    def lobbyBlocked(self, session, channelID, guildID):
+        # Why a lobby can't be made in the channel, or None if it can
+        bl = session.query(BlacklistChannel).filter(BlacklistChannel.id == channelID, BlacklistChannel.GuildID == guildID).one_or_none()
+        if bl is not None:
+            return "blacklisted"
+        if self.checkActiveLobby(session, channelID, guildID) is not None:
+            return "active"
+        return None
+
+    def checkActiveLobby(self, session, channelID, guildID):
+        activeLobby = session.query(Lobby.Active).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        return None if activeLobby is None else tuple(activeLobby)
+
+    def createEmptyLobby(self, session, channelID, guildID, pickMode):
         
         lobby = Lobby(ChannelID = channelID, GuildID = guildID, PickMode = pickMode, Games = [], Players = [], UserLimit = self.MAX_PLAYERS)
 
-        self.session.add(lobby)
-        self.session.commit()
+        session.add(lobby)
+        session.flush()
         
-        self.session.refresh(lobby)
+        session.refresh(lobby)
 
         team1 = Team(GuildID = guildID, ChannelID = channelID, Num = 1, LobbyID = lobby.id, Players = [])
         team2 = Team(GuildID = guildID, ChannelID = channelID, Num = 2, LobbyID = lobby.id, Players = [])
 
-        self.session.add_all([team1, team2])
+        session.add_all([team1, team2])
 
         lobby.Team1 = team1
         lobby.Team2 = team2
@@ -297,17 +329,32 @@ class MatchMaker(commands.Cog):
                      Set=set, _Map=choice(available_maps), GuildID = guildID,
                      ChannelID = channelID)
 
-        self.session.add_all([game1])
+        session.add_all([game1])
         lobby.Games.append(game1)
         lobby.Active = True
-        self.session.commit()
 
 
-    async def sayLobbyInfo(self, ctx):
+    def lobbyInfo(self, session, channelID, guildID):
+        # What sayLobbyInfo shows about the active lobby in the channel, or None if there is none
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID,
+                                            Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return None
+        info = {'completed': None, 'current': None, 'isPlaying': lobby.IsPlaying,
+                'team1': [p.UserID for p in lobby.Team1.Players], 'team2': [p.UserID for p in lobby.Team2.Players]}
+        if(lobby.Games is not None):
+            info['completed'] = sum(g.Completed for g in lobby.Games)
+            current = [g for g in lobby.Games if g.Active]
+            if( len(current) > 0):
+                info['current'] = (current[0].Set, current[0]._Map)
+        return info
+
+    async def sayLobbyInfo(self, ctx, info=False):
+        # info - A lobbyInfo result already read, otherwise the channel's lobby is looked up
         try:
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == ctx.message.channel.id,
-                                                     Lobby.GuildID == ctx.message.guild.id, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            if info is False:
+                info = await self.db.run(self.lobbyInfo, ctx.message.channel.id, ctx.message.guild.id)
+            if info is None:
                 await ctx.send("There is no active lobby in this channel. Start one with {}lobby start!"
                                .format(ctx.clean_prefix + self.GROUP + " "))
                 return
@@ -317,29 +364,27 @@ class MatchMaker(commands.Cog):
 
             msg = "Active Lobby for {}\n".format(channelName)
 
-            if(lobby.Games is not None):
-                msg += "Game Completed: {}/1\n".format(sum(g.Completed for g in lobby.Games))
+            if(info['completed'] is not None):
+                msg += "Game Completed: {}/1\n".format(info['completed'])
 
-                current = [g for g in lobby.Games if g.Active]
-                if( len(current) > 0):
-                    currentGame = current[0]
-                    msg += "Current Game: {} - **{}**\n".format(currentGame.Set, currentGame._Map)
+                if(info['current'] is not None):
+                    msg += "Current Game: {} - **{}**\n".format(*info['current'])
             else:
                 msg+="\n```\n"
             msg2 = ""
 
-            T1Players = lobby.Team1.Players
-            T2Players = lobby.Team2.Players
+            T1Players = info['team1']
+            T2Players = info['team2']
 
-            if not lobby.IsPlaying:
+            if not info['isPlaying']:
                 msg2 += "```No Teams Made\n```"
             elif len(T1Players) > 0 and len(T2Players) > 0:
                 headers = ["Team 1","Team 2"]
                 rows = []
                 for x in range(self.MAX_PLAYERS//2):
-                    t1N = await self.getUsernameFromID(T1Players[x].UserID)
+                    t1N = await self.getUsernameFromID(T1Players[x])
                     t1Name = t1N.name
-                    t2N = await self.getUsernameFromID(T2Players[x].UserID)
+                    t2N = await self.getUsernameFromID(T2Players[x])
                     t2Name = t2N.name
 
                     row = [t1Name, t2Name]
@@ -376,15 +421,12 @@ class MatchMaker(commands.Cog):
             if len(ctx.message.mentions) > 0:
                 msg_user = ctx.message.mentions[0]
 
-            user = self.session.query(User).filter(User.UserID == msg_user.id, User.GuildID == ctx.message.guild.id).one_or_none()
-            if user is None:
+            stats = await self.db.run(self.userStats, msg_user.id, ctx.message.guild.id)
+            if stats is None:
                 await ctx.send("User {} has not registered in this server! Type {}register to start!".format(msg_user.name, ctx.clean_prefix + self.GROUP + " "))
                 return
             headers = ["Rank", "User", "Wins/Losses", "Games Played", "Win Rate"]
-            all_ranks = self.session.query(Score.UserID).filter(Score.GuildID == ctx.message.guild.id).order_by(desc(Score.WinRate)).all()
-            all_ranks = [x[0] for x in all_ranks]
-            rank = (all_ranks).index(user.UserID) +1
-            rows = [[rank, msg_user.name, "{}/{}".format(user._Score.Wins, user._Score.Losses), user._Score.GamesPlayed, "{0:.2f}".format(user._Score.WinRate * 100) + "%"]]
+            rows = [[stats['rank'], msg_user.name, "{}/{}".format(stats['wins'], stats['losses']), stats['gamesPlayed'], "{0:.2f}".format(stats['winRate'] * 100) + "%"]]
             table = tabulate(rows, headers)
             await ctx.send("User Info for {} in server: {}\n```\n{}\n```\n".format(msg_user.name, ctx.message.guild.name,table))
         except Exception as e:
@@ -392,32 +434,83 @@ class MatchMaker(commands.Cog):
             traceback.print_exc()
             print(e)
 
+    def userStats(self, session, userID, guildID):
+        user = session.query(User).filter(User.UserID == userID, User.GuildID == guildID).one_or_none()
+        if user is None:
+            return None
+        # Counted on the (GuildID, WinRate) index in RANK_ORDER, the order the leaderboard lists
+        score = user._Score
+        better = session.query(func.count(Score.id)).filter(Score.GuildID == guildID,
+                                                            Score.WinRate > score.WinRate).scalar()
+        tiedBefore = session.query(func.count(Score.id)).filter(Score.GuildID == guildID, Score.WinRate == score.WinRate,
+                                                                Score.id < score.id).scalar()
+        rank = better + tiedBefore + 1
+        return {'rank': rank, 'wins': user._Score.Wins, 'losses': user._Score.Losses,
+                'gamesPlayed': user._Score.GamesPlayed, 'winRate': user._Score.WinRate}
+
     @mm.command(brief="View Top 25", aliases=['top'],
-                 description="View the top 25 users by rank! See who has those top points.")
+                 description="View the top 25 users by rank! See who has those top points. Give a page number to see the ranks after them.")
     @commands.guild_only()
-    async def leaderboard(self, ctx):
+    async def leaderboard(self, ctx, page: int = 1):
         try:
             guildID = ctx.message.guild.id
+            if page < 1 or page > self.LEADERBOARD_SIZE // self.LEADERBOARD_PAGE:
+                await ctx.send("Please choose a page from 1 to {}".format(self.LEADERBOARD_SIZE // self.LEADERBOARD_PAGE))
+                return
 
-            scores = self.session.query(Score).filter(Score.GuildID == guildID).order_by(desc(Score.WinRate)).limit(25).all()
-            headers = ["Rank", "User", "Wins/Losses", "Games Played", "Win Rate"]
-            rows = [("{}.".format(scores.index(s)+1),
-                (self.bot.get_user(s.UserID)).name, "{}/{}".format(s.Wins, s.Losses),
-                s.GamesPlayed, "{0:.2f}".format(s.WinRate * 100) + "%") for s in scores]
-            table = tabulate(rows, headers)
-            await ctx.send("Leaderboard (T25) for {}\n```\n{}\n```\n".format(ctx.message.guild.name, table))
+            table = await self.leaderboardPage(guildID, page)
+            if table is None:
+                await ctx.send("There are no ranks on page {} yet".format(page))
+                return
+            if page == 1:
+                title = "Leaderboard (T{})".format(self.LEADERBOARD_PAGE)
+            else:
+                title = "Leaderboard ({}-{})".format((page-1) * self.LEADERBOARD_PAGE + 1, page * self.LEADERBOARD_PAGE)
+            await ctx.send("{} for {}\n```\n{}\n```\n".format(title, ctx.message.guild.name, table))
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)    
 
+    async def leaderboardPage(self, guildID, page):
+        # The table of one page of the guild's leaderboard, or None if the page has no ranks
+        cached = self.leaderboards.get(guildID)
+        if cached is None:
+            version = self.leaderboardVersions.get(guildID, 0)
+            scores = await self.db.run(self.topScores, guildID, self.LEADERBOARD_SIZE)
+            rows = []
+            for i, (userID, wins, losses, gamesPlayed, winRate) in enumerate(scores):
+                user = self.bot.get_user(userID)
+                rows.append(("{}.".format(i+1), user.name if user is not None else str(userID),
+                             "{}/{}".format(wins, losses), gamesPlayed, "{0:.2f}".format(winRate * 100) + "%"))
+            cached = (rows, {})
+            if self.leaderboardVersions.get(guildID, 0) == version:
+                self.leaderboards[guildID] = cached
+
+        rows, pages = cached
+        if page not in pages:
+            start = (page-1) * self.LEADERBOARD_PAGE
+            if start >= len(rows):
+                return None
+            headers = ["Rank", "User", "Wins/Losses", "Games Played", "Win Rate"]
+            pages[page] = tabulate(rows[start:start + self.LEADERBOARD_PAGE], headers)
+        return pages[page]
+
+    def invalidateLeaderboard(self, guildID):
+        self.leaderboards.pop(guildID, None)
+        self.leaderboardVersions[guildID] = self.leaderboardVersions.get(guildID, 0) + 1
+
+    def topScores(self, session, guildID, limit):
+        scores = session.query(Score).filter(Score.GuildID == guildID).order_by(*RANK_ORDER).limit(limit).all()
+        return [(s.UserID, s.Wins, s.Losses, s.GamesPlayed, s.WinRate) for s in scores]
+
     @mod.command(brief="DEV - View all users in server", aliases=["allusers"])
     @commands.guild_only()
     async def users(self, ctx):
         try:
-            users = self.session.query(User).filter(User.GuildID == ctx.message.guild.id).all()
+            users = await self.db.run(self.guildUsers, ctx.message.guild.id)
             headers=['Username', 'ID', 'GuildID', "Games Played"]
-            rows = [(await self.getUsernameFromID(u.UserID), u.UserID, u.GuildID, u._Score.GamesPlayed) for u in users]
+            rows = [(await self.getUsernameFromID(userID), userID, guildID, gamesPlayed) for userID, guildID, gamesPlayed in users]
             table = tabulate(rows, headers)
             await ctx.send('Registered Users:\n```\n'+table+'\n```')
         except Exception as e:
@@ -425,6 +518,10 @@ class MatchMaker(commands.Cog):
             traceback.print_exc()
             print(e)
     
+    def guildUsers(self, session, guildID):
+        users = session.query(User).filter(User.GuildID == guildID).all()
+        return [(u.UserID, u.GuildID, u._Score.GamesPlayed) for u in users]
+
     @lobby.command(brief="Leave a lobby before games start", aliases=['quit'],
                  description="Leave a lobby before games start being played. To leave after, you may consider cancelling the lobby")
     @commands.guild_only()
@@ -435,38 +532,47 @@ class MatchMaker(commands.Cog):
 
         try:
             msg = ""
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            result = await self.db.write(self.leaveLobby, channelID, guildID, msg_user.id)
+            if result == "no_lobby":
                 await ctx.send("There is no active lobby in this channel. Start one with {}lobby start!".format(ctx.clean_prefix + self.GROUP + " "))
                 return
-            if lobby.IsPlaying:
+            if result == "playing":
                 await ctx.send("The games are already in progress. Cannot leave. Please consider remaking the lobby.")
                 return
-            added_players = [p.UserID for p in lobby.Players]
-
-            if msg_user.id not in added_players:
+            if result == "not_in_lobby":
                 await ctx.send("User {} is not in the lobby!".format(msg_user.name))
                 return
-
-            t1 = [p.UserID for p in lobby.Team1.Players]
-            t2 = [p.UserID for p in lobby.Team2.Players]
-            
-            for player in lobby.Players:
-                if player.UserID == msg_user.id:
-                    if player.UserID in t1:
-                        lobby.Team1.Players.remove(player)
-                    elif player.UserID in t2:
-                        lobby.Team2.Players.remove(player)
-                    lobby.Players.remove(player)
-                    self.session.delete(player)
-                    self.session.commit()
-                    break
             await ctx.send("Removed user {} from lobby queue".format(msg_user.name))
         except Exception as e:
             await ctx.send("Could not complete your command")
             traceback.print_exc()
             print(e)
 
+    def leaveLobby(self, session, channelID, guildID, userID):
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return "no_lobby"
+        if lobby.IsPlaying:
+            return "playing"
+        added_players = [p.UserID for p in lobby.Players]
+
+        if userID not in added_players:
+            return "not_in_lobby"
+
+        t1 = [p.UserID for p in lobby.Team1.Players]
+        t2 = [p.UserID for p in lobby.Team2.Players]
+
+        for player in lobby.Players:
+            if player.UserID == userID:
+                if player.UserID in t1:
+                    lobby.Team1.Players.remove(player)
+                elif player.UserID in t2:
+                    lobby.Team2.Players.remove(player)
+                lobby.Players.remove(player)
+                session.delete(player)
+                break
+        return "removed"
+
     @lobby.command(brief="Join a lobby in the channel", aliases=['play', 'enlist'],
                  description="Join the active lobby for this channel. Can't start unless full")
     @commands.guild_only()
@@ -477,40 +583,55 @@ class MatchMaker(commands.Cog):
 
         try:
             msg = ""
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            result, playerCount, pickMode = await self.db.write(self.joinLobby, channelID, guildID, msg_user.id)
+            if result == "no_lobby":
                 await ctx.send("There is no active lobby in this channel. Start one with {}lobby start!".format(ctx.clean_prefix + self.GROUP + " "))
                 return
-            if len(lobby.Players) >= self.MAX_PLAYERS:
+            if result == "full":
                 await ctx.send("This lobby has maxed players. Please wait for a new lobby.")
                 return
-            user = self.session.query(User).filter(User.UserID == msg_user.id, User.GuildID == guildID).one_or_none()
-            if user is None:
+            if result == "not_registered":
                 await ctx.send("User {} is not registered yet! Please register first.".format(msg_user.name))
                 return
-            if lobby.IsPlaying:
+            if result == "playing":
                 await ctx.send("Games are in progress! Cannot join.")
                 return
-            added_players = [p.UserID for p in lobby.Players]
-            if msg_user.id in added_players:
+            if result == "in_lobby":
                 await ctx.send("User {} is already in the lobby!".format(msg_user.name))
                 return
-            
-            player = Player(UserID = msg_user.id, GuildID = guildID, LobbyID = lobby.id)
-            lobby.Players.append(player)
-            
-            self.session.add(player)
-            self.session.commit()
-            self.session.refresh(lobby)
             await ctx.send(msg+"Successfully added player {}".format(msg_user.name))
 
-            if len(lobby.Players) >= self.MAX_PLAYERS:
-                await ctx.send("{} players have joined. PickMode = {}. Do `{} lobby setup` to randomize teams.".format(self.MAX_PLAYERS, PickMode(lobby.PickMode).name, ctx.clean_prefix + self.GROUP + " "))
+            if playerCount >= self.MAX_PLAYERS:
+                await ctx.send("{} players have joined. PickMode = {}. Do `{} lobby setup` to randomize teams.".format(self.MAX_PLAYERS, PickMode(pickMode).name, ctx.clean_prefix + self.GROUP + " "))
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)
 
+    def joinLobby(self, session, channelID, guildID, userID):
+        # Returns (result, players in the lobby, lobby pick mode)
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return "no_lobby", 0, None
+        if len(lobby.Players) >= self.MAX_PLAYERS:
+            return "full", len(lobby.Players), lobby.PickMode
+        user = session.query(User).filter(User.UserID == userID, User.GuildID == guildID).one_or_none()
+        if user is None:
+            return "not_registered", len(lobby.Players), lobby.PickMode
+        if lobby.IsPlaying:
+            return "playing", len(lobby.Players), lobby.PickMode
+        added_players = [p.UserID for p in lobby.Players]
+        if userID in added_players:
+            return "in_lobby", len(lobby.Players), lobby.PickMode
+
+        player = Player(UserID = userID, GuildID = guildID, LobbyID = lobby.id)
+        lobby.Players.append(player)
+
+        session.add(player)
+        session.flush()
+        session.refresh(lobby)
+        return "joined", len(lobby.Players), lobby.PickMode
+
     @lobby.command(brief="MOD - Setup players to teams", aliases=['teams'],
                  description="Start team selection for the current lobby. Done randomly, repeat command to shuffle again.")
     @commands.guild_only()
@@ -535,37 +656,16 @@ class MatchMaker(commands.Cog):
         guildID = ctx.message.guild.id
         msg_user = ctx.author
         try:
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            result, playerCount = await self.db.write(self.setupTeams, channelID, guildID)
+            if result == "no_lobby":
                 await ctx.send("There is no active lobby in this channel. Start one with {}lobby start!".format(ctx.clean_prefix + self.GROUP + " "))
                 return
-            if( len(lobby.Players) < self.MAX_PLAYERS):
-                await ctx.send("You do not have enough players to setup teams. Currently have {}/{}".format(len(lobby.Players), self.MAX_PLAYERS))
+            if result == "not_enough_players":
+                await ctx.send("You do not have enough players to setup teams. Currently have {}/{}".format(playerCount, self.MAX_PLAYERS))
                 return
-            if(lobby.IsPickingTeams):
+            if result == "picking":
                 await ctx.send("Teams are currently being setup")
                 return
-            if(PickMode(lobby.PickMode).name == "Random"):
-                team1 = lobby.Team1
-                team2 = lobby.Team2
-                players = [p for p in lobby.Players]
-                shuffle(players)
-
-                x = 0
-
-                while (len(players) > 0):
-                    p = players.pop()
-                    if x % 2 == 0:
-                        p.TeamID == team1.id
-                        team1.Players.append(p)
-                    else:
-                        p.TeamID == team2.id
-                        team2.Players.append(p)
-                    x+=1
-            
-            lobby.Games[0].IsPickingTeams = False
-            lobby.IsPlaying = True
-            self.session.commit()
             msg = "Teams have been chosen! Please start playing.\n\n"
             msg += "- There is 1 round.\n"
             msg += "- When a game is over, a BotModerator must perform {}lobby end (1/2 for winning team)\n".format(ctx.clean_prefix + self.GROUP + " ")
@@ -578,6 +678,37 @@ class MatchMaker(commands.Cog):
             traceback.print_exc()
             print(e)
     
+    def setupTeams(self, session, channelID, guildID):
+        # Returns (result, players in the lobby)
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return "no_lobby", 0
+        if( len(lobby.Players) < self.MAX_PLAYERS):
+            return "not_enough_players", len(lobby.Players)
+        if(lobby.IsPickingTeams):
+            return "picking", len(lobby.Players)
+        if(PickMode(lobby.PickMode).name == "Random"):
+            team1 = lobby.Team1
+            team2 = lobby.Team2
+            players = [p for p in lobby.Players]
+            shuffle(players)
+
+            x = 0
+
+            while (len(players) > 0):
+                p = players.pop()
+                if x % 2 == 0:
+                    p.TeamID == team1.id
+                    team1.Players.append(p)
+                else:
+                    p.TeamID == team2.id
+                    team2.Players.append(p)
+                x+=1
+
+        lobby.Games[0].IsPickingTeams = False
+        lobby.IsPlaying = True
+        return "ready", len(lobby.Players)
+
     @lobby.command(brief="Current Players in Active Lobby",
                  description="View the current players in the active lobby for this channel")
     @commands.guild_only()
@@ -585,13 +716,13 @@ class MatchMaker(commands.Cog):
         channelID = ctx.message.channel.id
         guildID =ctx.message.guild.id
         try:
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            playerIDs = await self.db.run(self.lobbyPlayers, channelID, guildID)
+            if playerIDs is None:
                 await ctx.send("There is no active lobby in this channel. Start one with "+ ctx.clean_prefix + self.GROUP + " "+"lobby start!")
                 return
-            players = [ (self.bot.get_user(p.UserID)).name for p in lobby.Players]
+            players = [ (self.bot.get_user(userID)).name for userID in playerIDs]
             msg = "```\n"
-            msg += "Player Count: {}/{}\n\nPlayers:\n".format(len(lobby.Players), self.MAX_PLAYERS)
+            msg += "Player Count: {}/{}\n\nPlayers:\n".format(len(playerIDs), self.MAX_PLAYERS)
             msg += "\n".join(players)
             msg += "\n```\n"
             await ctx.send(msg)
@@ -601,6 +732,12 @@ class MatchMaker(commands.Cog):
             print(e)
             
 
+    def lobbyPlayers(self, session, channelID, guildID):
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return None
+        return [p.UserID for p in lobby.Players]
+
     @lobby.command(brief="MOD - End Current Game (not lobby). Param Victor -> The winning team #", aliases=['finish'],
                  description="End an active game inside the active lobby.\nParameter Victor must be the winning team number (1 or 2)")
     async def end(self, ctx, victor: int):
@@ -626,54 +763,72 @@ class MatchMaker(commands.Cog):
         channelID = ctx.message.channel.id
         guildID = ctx.message.guild.id
         try: 
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            result, info, nextGame = await self.db.write(self.endGame, channelID, guildID, victor)
+            if result == "no_lobby":
                 await ctx.send("There is no active lobby in this channel. Start one with {}lobby start!".format(ctx.clean_prefix + self.GROUP + " "))
                 return
-            if not lobby.IsPlaying:
+            if result == "not_playing":
                 await ctx.send("This lobby has not started any games yet!")
                 return
-            team1_ids = [p.UserID for p in lobby.Team1.Players]
-            team2_ids = [p.UserID for p in lobby.Team2.Players]
+            self.invalidateLeaderboard(guildID)
 
-            t1Scores = self.session.query(Score).filter(Score.UserID.in_(team1_ids), Score.GuildID == guildID).all()
-            t2Scores = self.session.query(Score).filter(Score.UserID.in_(team2_ids), Score.GuildID == guildID).all()
-            
-            
-            for score in t1Scores:
-                score.GamesPlayed += 1
-                if victor == 1:
-                    score.Wins += 1
-                else:
-                    score.Losses += 1
-            for score in t2Scores:
-                score.GamesPlayed += 1
-                if victor == 2:
-                    score.Wins += 1
-                else:
-                    score.Losses += 1
-            numCompleted = sum(g.Completed for g in lobby.Games)
-            if numCompleted < 1:
-                lobby.Games[numCompleted].Completed = True
-                lobby.Games[numCompleted].Active = False
-
-            await self.sayLobbyInfo(ctx)
+            await self.sayLobbyInfo(ctx, info)
             await ctx.send("**Winner: Team {}!**".format(victor))
 
-            if lobby.Games[0].Completed:
+            if nextGame is None:
                 # no more games, lobby closed
                 
                 await ctx.send("All games have been completed for this lobby. Make a new lobby to play again!\n\nThanks for playing!")
-                lobby.Active = False
             else:
-                await ctx.send("Game Completed! Next game starts now: {} - {}".format(lobby.Games[numCompleted+1].Set,lobby.Games[numCompleted+1]._Map))
-            lobby.GamesPlayed += 1                
-            self.session.commit()
+                await ctx.send("Game Completed! Next game starts now: {} - {}".format(*nextGame))
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)
             
+    def endGame(self, session, channelID, guildID, victor):
+        # Returns (result, lobby info as the game ended, (set, map) of the next game or None if the lobby closed)
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return "no_lobby", None, None
+        if not lobby.IsPlaying:
+            return "not_playing", None, None
+        team1_ids = [p.UserID for p in lobby.Team1.Players]
+        team2_ids = [p.UserID for p in lobby.Team2.Players]
+
+        t1Scores = session.query(Score).filter(Score.UserID.in_(team1_ids), Score.GuildID == guildID).all()
+        t2Scores = session.query(Score).filter(Score.UserID.in_(team2_ids), Score.GuildID == guildID).all()
+
+        for score in t1Scores:
+            score.GamesPlayed += 1
+            if victor == 1:
+                score.Wins += 1
+            else:
+                score.Losses += 1
+            score.refreshWinRate()
+        for score in t2Scores:
+            score.GamesPlayed += 1
+            if victor == 2:
+                score.Wins += 1
+            else:
+                score.Losses += 1
+            score.refreshWinRate()
+        numCompleted = sum(g.Completed for g in lobby.Games)
+        if numCompleted < 1:
+            lobby.Games[numCompleted].Completed = True
+            lobby.Games[numCompleted].Active = False
+
+        info = self.lobbyInfo(session, channelID, guildID)
+
+        nextGame = None
+        if lobby.Games[0].Completed:
+            # no more games, lobby closed
+            lobby.Active = False
+        else:
+            nextGame = (lobby.Games[numCompleted+1].Set, lobby.Games[numCompleted+1]._Map)
+        lobby.GamesPlayed += 1
+        return "ended", info, nextGame
+
     @lobby.command(brief="MOD - Cancel Lobby Prematurely",
                  description="BotModerator +. Cancel a lobby in progress")
     @commands.guild_only()
@@ -697,20 +852,24 @@ class MatchMaker(commands.Cog):
         try:
             channelID = ctx.message.channel.id
             guildID = ctx.message.guild.id
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is None:
+            if not await self.db.write(self.cancelLobby, channelID, guildID):
                 await ctx.send("There is no active lobby in this channel. Start one with "+ctx.clean_prefix + self.GROUP + " "+"lobby start!")
                 return
-            for g in lobby.Games:
-                g.Active = False
-            lobby.Active = False
-            self.session.commit()
             await ctx.send("Lobby has been cancelled successfully")
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)
 
+    def cancelLobby(self, session, channelID, guildID):
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is None:
+            return False
+        for g in lobby.Games:
+            g.Active = False
+        lobby.Active = False
+        return True
+
     @mod.command(brief="Add Losses to a User (in case of missed or lost data)", aliases=['addlosses', 'addloss', 'addLoss'])
     @commands.guild_only()
     async def addLosses(self, ctx, user: discord.Member, amt:int):
@@ -721,22 +880,31 @@ class MatchMaker(commands.Cog):
             await ctx.send("Please mention a single valid user")
         try:
 
-            user = self.session.query(User).filter(User.GuildID == ctx.message.guild.id, User.UserID == int(ctx.message.mentions[0].id)).one_or_none()
-            if user is None:
+            result = await self.db.write(self.addUserLosses, ctx.message.guild.id, int(ctx.message.mentions[0].id), amt)
+            if result == "not_registered":
                 await ctx.send("User {} has not registered yet!".format(ctx.message.mentions[0].name))
                 return
-            if(user._Score.GamesPlayed + amt < 0 or user._Score.Losses + amt < 0):
+            if result == "negative":
                 await ctx.send("Could not add losses as they would make total games played or losses negative")
                 return
-            user._Score.GamesPlayed += amt
-            user._Score.Losses += amt
-            self.session.commit()
+            self.invalidateLeaderboard(ctx.message.guild.id)
             await ctx.send("Successfully added losses to {}.".format(ctx.message.mentions[0].name))
         except Exception as e:
             await ctx.send("Could not complete your command")
             traceback.print_exc()
             print(e)
 
+    def addUserLosses(self, session, guildID, userID, amt):
+        user = session.query(User).filter(User.GuildID == guildID, User.UserID == userID).one_or_none()
+        if user is None:
+            return "not_registered"
+        if(user._Score.GamesPlayed + amt < 0 or user._Score.Losses + amt < 0):
+            return "negative"
+        user._Score.GamesPlayed += amt
+        user._Score.Losses += amt
+        user._Score.refreshWinRate()
+        return "added"
+
     @mod.command(brief="Force-Register as a User",
                  description="Force Register a user on the server")
     @commands.guild_only()
@@ -760,22 +928,31 @@ class MatchMaker(commands.Cog):
             await ctx.send("Please mention a single valid user")
         try:
 
-            user = self.session.query(User).filter(User.GuildID == ctx.message.guild.id, User.UserID == int(ctx.message.mentions[0].id)).one_or_none()
-            if user is None:
+            result = await self.db.write(self.addUserWins, ctx.message.guild.id, int(ctx.message.mentions[0].id), amt)
+            if result == "not_registered":
                 await ctx.send("User {} has not registered yet!".format(ctx.message.mentions[0].name))
                 return
-            if(user._Score.GamesPlayed + amt < 0 or user._Score.Wins + amt < 0):
+            if result == "negative":
                 await ctx.send("Could not add wins as they would make total games played or wins negative")
                 return
-            user._Score.GamesPlayed += amt
-            user._Score.Wins += amt
-            self.session.commit()
+            self.invalidateLeaderboard(ctx.message.guild.id)
             await ctx.send("Successfully added wins to {}.".format(ctx.message.mentions[0].name))
         except Exception as e:
             await ctx.send("Could not complete your command")
             traceback.print_exc()
             print(e)
 
+    def addUserWins(self, session, guildID, userID, amt):
+        user = session.query(User).filter(User.GuildID == guildID, User.UserID == userID).one_or_none()
+        if user is None:
+            return "not_registered"
+        if(user._Score.GamesPlayed + amt < 0 or user._Score.Wins + amt < 0):
+            return "negative"
+        user._Score.GamesPlayed += amt
+        user._Score.Wins += amt
+        user._Score.refreshWinRate()
+        return "added"
+
     @mod.command(brief="COM - Reset server stats, games, lobbies.",
                  description="BotCommander only. Prunes all guild related data and resets player stats. It keeps blacklisted channels. Players will need to re-register.")
     @commands.guild_only()
@@ -798,27 +975,28 @@ class MatchMaker(commands.Cog):
             await ctx.send("You do not have permission for this command")
             return
         try:
-            guildID = ctx.message.guild.id
-            query = Game.__table__.delete().where(Game.GuildID == guildID)
-            self.session.execute(query)
-            query = Team.__table__.delete().where(Team.GuildID == guildID)
-            self.session.execute(query)
-            query = Player.__table__.delete().where(Player.GuildID == guildID)
-            self.session.execute(query)
-            query = Lobby.__table__.delete().where(Lobby.GuildID == guildID)
-            self.session.execute(query)
-            query = Score.__table__.delete().where(Score.GuildID == guildID)
-            self.session.execute(query)
-            query = User.__table__.delete().where(User.GuildID == guildID)
-            self.session.execute(query)
-
-            self.session.commit()
+            await self.db.write(self.wipeGuild, ctx.message.guild.id)
+            self.invalidateLeaderboard(ctx.message.guild.id)
             await ctx.send("Wipe Complete")
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)
 
+    def wipeGuild(self, session, guildID):
+        query = Game.__table__.delete().where(Game.GuildID == guildID)
+        session.execute(query)
+        query = Team.__table__.delete().where(Team.GuildID == guildID)
+        session.execute(query)
+        query = Player.__table__.delete().where(Player.GuildID == guildID)
+        session.execute(query)
+        query = Lobby.__table__.delete().where(Lobby.GuildID == guildID)
+        session.execute(query)
+        query = Score.__table__.delete().where(Score.GuildID == guildID)
+        session.execute(query)
+        query = User.__table__.delete().where(User.GuildID == guildID)
+        session.execute(query)
+
     @mod.command(brief="COM - Prune old, inactive data for OCD",
                  description="BotCommander and Dev roles only. This prunes old data from the db where the associated lobby for this guild is inactive.")
     @commands.guild_only()
@@ -841,25 +1019,25 @@ class MatchMaker(commands.Cog):
             await ctx.send("You do not have permission for this command")
             return
         try:
-            guildID = ctx.message.guild.id
-            inactive_lobbies = self.session.query(Lobby.id).filter(Lobby.Active == False, Lobby.GuildID == guildID)
-
-            query = Game.__table__.delete().where(Game.LobbyID.in_(inactive_lobbies))
-            self.session.execute(query)
-            query = Team.__table__.delete().where(Team.LobbyID.in_(inactive_lobbies))
-            self.session.execute(query)
-            query = Player.__table__.delete().where(Player.LobbyID.in_(inactive_lobbies))
-            self.session.execute(query)
-            query = Lobby.__table__.delete().where(Lobby.id.in_(inactive_lobbies))
-            self.session.execute(query)
-
-            self.session.commit()
+            await self.db.write(self.pruneGuild, ctx.message.guild.id)
             await ctx.send("Pruned Old Data")
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)        
 
+    def pruneGuild(self, session, guildID):
+        inactive_lobbies = session.query(Lobby.id).filter(Lobby.Active == False, Lobby.GuildID == guildID)
+
+        query = Game.__table__.delete().where(Game.LobbyID.in_(inactive_lobbies))
+        session.execute(query)
+        query = Team.__table__.delete().where(Team.LobbyID.in_(inactive_lobbies))
+        session.execute(query)
+        query = Player.__table__.delete().where(Player.LobbyID.in_(inactive_lobbies))
+        session.execute(query)
+        query = Lobby.__table__.delete().where(Lobby.id.in_(inactive_lobbies))
+        session.execute(query)
+
     @mod.command(brief="Blacklist current channel from creating lobbies",
                  description="Blacklist the current channel from creating lobbies")
     @commands.guild_only()
@@ -884,18 +1062,12 @@ class MatchMaker(commands.Cog):
             
             channelID = ctx.message.channel.id
             guildID = ctx.message.guild.id
-            lobby = self.session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
-            if lobby is not None:
-                lobby.Active = False
+            cancelled, alreadyBlacklisted = await self.db.write(self.blacklistChannel, channelID, guildID)
+            if cancelled:
                 await ctx.send("Cancelling active lobby in this channel...")
-
-            bl = self.session.query(BlacklistChannel).filter(BlacklistChannel.GuildID == guildID, BlacklistChannel.id == channelID).one_or_none()
-            if bl is not None:
+            if alreadyBlacklisted:
                 await ctx.send("Channel is already blacklisted from creating lobbies!")
                 return
-            bl = BlacklistChannel(id = channelID, GuildID = guildID)
-            self.session.add(bl)
-            self.session.commit()
             await ctx.send("Channel is now blacklisted")
             
         except Exception as e:
@@ -903,6 +1075,19 @@ class MatchMaker(commands.Cog):
             traceback.print_exc()
             print(e)      
                           
+    def blacklistChannel(self, session, channelID, guildID):
+        # Returns (whether an active lobby was cancelled, whether the channel was already blacklisted)
+        lobby = session.query(Lobby).filter(Lobby.ChannelID == channelID, Lobby.GuildID == guildID, Lobby.Active == True).one_or_none()
+        if lobby is not None:
+            lobby.Active = False
+
+        bl = session.query(BlacklistChannel).filter(BlacklistChannel.GuildID == guildID, BlacklistChannel.id == channelID).one_or_none()
+        if bl is not None:
+            return lobby is not None, True
+        bl = BlacklistChannel(id = channelID, GuildID = guildID)
+        session.add(bl)
+        return lobby is not None, False
+
     @mod.command(brief="Remove current channel from the blacklist",
                  description="Remove the current channel from the blacklist")
     @commands.guild_only()
@@ -927,18 +1112,22 @@ class MatchMaker(commands.Cog):
             
             channelID = ctx.message.channel.id
             guildID = ctx.message.guild.id
-            bl = self.session.query(BlacklistChannel).filter(BlacklistChannel.GuildID == guildID, BlacklistChannel.id == channelID).one_or_none()
-            if bl is None:
+            if not await self.db.write(self.whitelistChannel, channelID, guildID):
                 await ctx.send("Channel was not blacklisted!")
                 return
-            self.session.delete(bl)
-            self.session.commit()
             await ctx.send("Channel has been removed from the blacklist")
         except Exception as e:
             await ctx.send('Could not complete your command')
             traceback.print_exc()
             print(e)  
 
+    def whitelistChannel(self, session, channelID, guildID):
+        bl = session.query(BlacklistChannel).filter(BlacklistChannel.GuildID == guildID, BlacklistChannel.id == channelID).one_or_none()
+        if bl is None:
+            return False
+        session.delete(bl)
+        return True
+
     @mm.command(brief="MatchMaker Extension made by WolfwithSword#0001")
     async def dev(self, ctx):
         msg = "MatchMaking Cog for Onward specifically, modified from a CoD 10 man's bot also made by the same idiot who made this...\n"
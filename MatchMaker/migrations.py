@@ -0,0 +1,47 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from .models import Base
+
+# Steps bringing a matchmaker-bot.db made by an older version up to date with models.py.
+# Every step checks what is already there, so they all run on each startup.
+
+
+def addWinRate(conn, log):
+    # Score.WinRate used to be computed in every query; it is now a column, filled in from the counts
+    columns = [c['name'] for c in inspect(conn).get_columns('score')]
+    if 'WinRate' in columns:
+        return
+    conn.execute(text("ALTER TABLE score ADD COLUMN WinRate FLOAT NOT NULL DEFAULT 0.0"))
+    conn.execute(text("UPDATE score SET WinRate = CASE WHEN GamesPlayed > 0 "
+                      "THEN CAST(Wins AS FLOAT) / CAST(GamesPlayed AS FLOAT) ELSE 0.0 END"))
+
+
+def addIndexes(conn, log):
+    # Creates the indexes declared in the models that the database does not have yet
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            fallback = index.name + "_nonunique"
+            try:
+                index.create(bind=conn, checkfirst=True)
+            except IntegrityError as e:
+                # Older databases never enforced uniqueness and may hold duplicates. Index the same columns
+                # without the constraint so lookups stay fast; the unique index is tried again on the
+                # next startup.
+                columns = ", ".join('"{}"'.format(c.name) for c in index.columns)
+                conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS "{}" ON "{}" ({})'.format(fallback, table.name, columns))
+                log.warning("Could not create unique index %s on %s, duplicate rows need removing. "
+                            "Using non-unique index %s until then: %s", index.name, table.name, fallback, e)
+            else:
+                if index.unique:
+                    conn.exec_driver_sql('DROP INDEX IF EXISTS "{}"'.format(fallback))
+
+
+# in order, indexes last as they may cover columns added by the other steps
+MIGRATIONS = [addWinRate, addIndexes]
+
+
+def migrate(engine, log):
+    with engine.begin() as conn:
+        for step in MIGRATIONS:
+            step(conn, log)
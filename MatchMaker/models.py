@@ -1,8 +1,7 @@
-from sqlalchemy import Column, ForeignKey, UniqueConstraint, CheckConstraint, case, func, cast
+from sqlalchemy import Column, ForeignKey, UniqueConstraint, CheckConstraint, Index, case, func, cast
 from sqlalchemy.orm import relationship, backref, column_property
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.sqlite import INTEGER, TEXT, BOOLEAN, FLOAT
-from sqlalchemy.ext.hybrid import hybrid_property, Comparator
 from enum import Enum
 from .enums import *
 
@@ -10,11 +9,12 @@ Base = declarative_base()
 
 class MapInfo(Base):
     __tablename__ = 'mapinfo'
-    __table_args__ = {'sqlite_autoincrement': True}
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     Set = Column(TEXT, ForeignKey('mapset.Name'))
     _Map = Column(TEXT, ForeignKey('map.Name'))
-    UniqueConstraint('Set','_Map', name='uix_1')
+    __table_args__ = (
+        Index('uix_1', 'Set', '_Map', unique=True),
+        {'sqlite_autoincrement': True})
 
 class MapSet(Base):
     __tablename__ = 'mapset'
@@ -30,7 +30,9 @@ class Map(Base):
 
 class Game(Base):
     __tablename__ = 'game'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        Index('ix_game_lobby', 'LobbyID'),
+        {'sqlite_autoincrement': True})
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     LobbyID = Column(INTEGER, ForeignKey('lobby.id', ondelete="CASCADE"), nullable=False)
     IsPickingTeams = Column(BOOLEAN, default=False)
@@ -52,11 +54,14 @@ class Team(Base):
     __table_args__ = (
         CheckConstraint(Num <= 2, name="check_team_num"),
         CheckConstraint(Num >= 1, name="check_team_num2"),
+        Index('ix_team_lobby_num', 'LobbyID', 'Num'),
         {'sqlite_autoincrement': True})
 
 class Player(Base):
     __tablename__ = 'player'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        Index('ix_player_lobby', 'LobbyID'),
+        {'sqlite_autoincrement': True})
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     UserID = Column(INTEGER, ForeignKey('user.UserID'), nullable=False)
     GuildID = Column(INTEGER, ForeignKey('user.GuildID'), nullable=False)
@@ -65,7 +70,10 @@ class Player(Base):
     
 class Lobby(Base):
     __tablename__ = 'lobby'
-    __table_args__ = {'sqlite_autoincrement': True}
+    # every lobby command looks up the channel's active lobby
+    __table_args__ = (
+        Index('ix_lobby_channel_guild_active', 'ChannelID', 'GuildID', 'Active'),
+        {'sqlite_autoincrement': True})
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     GuildID = Column(INTEGER, ForeignKey("guild.id"), nullable=False)
     ChannelID = Column(INTEGER, nullable=False)
@@ -86,19 +94,23 @@ class Lobby(Base):
 
 class User(Base):
     __tablename__ = 'user'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        Index('uix_2', 'UserID', 'GuildID', unique=True),
+        Index('ix_user_guild', 'GuildID'),
+        {'sqlite_autoincrement': True})
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     UserID = Column(INTEGER, nullable=False)
     GuildID = Column(INTEGER, ForeignKey('guild.id'), nullable=False)
     _Score = relationship("Score",
                           primaryjoin="and_(User.UserID == Score.UserID,User.GuildID == Score.GuildID)",
                           back_populates="_User", uselist=False)
-    UniqueConstraint('UserID','GuildID', name='uix_2')
 
 
 class Score(Base):
     __tablename__ = 'score'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        Index('ix_score_guild_user', 'GuildID', 'UserID'),
+        {'sqlite_autoincrement': True})
     id = Column(INTEGER, primary_key=True, nullable=False, autoincrement=True)
     UserID = Column(INTEGER, ForeignKey("user.UserID"), nullable=False)
     GuildID = Column(INTEGER, ForeignKey("user.GuildID"), nullable=False)
@@ -107,33 +119,17 @@ class Score(Base):
     Wins = Column(INTEGER, default=0)
     Losses = Column(INTEGER, default=0)
     GamesPlayed = Column(INTEGER, default=0)
-    WinRate = Column("WinRate", FLOAT, default=0.0)
+    # Stored so the leaderboard can be read in order from an index. Call refreshWinRate after changing
+    # Wins, Losses or GamesPlayed.
+    WinRate = Column(FLOAT, default=0.0, nullable=False)
 
-    @hybrid_property
-    def WinRate(self):
-        if self.GamesPlayed == 0:
-            return 0.0
+    def refreshWinRate(self):
+        if not self.GamesPlayed:
+            self.WinRate = 0.0
         else:
-            return float(self.Wins) / float(self.GamesPlayed)
-
-    @WinRate.expression
-    def WinRate(cls):
-        return case([(cls.GamesPlayed > 0, cast(cls.Wins, FLOAT) / cast(cls.GamesPlayed, FLOAT))], else_ = 0.0)
-
-    @WinRate.comparator
-    def WinRate(cls):
-        return WinRateComparator( cast(cls.Wins, FLOAT) / cast(cls.GamesPlayed, FLOAT) * 100.00)
-
-class WinRateComparator(Comparator):
-
-    def __eq__(self, other):
-        return self.__clause_element__() == other
-
-    def __gt__(self, other):
-        return self.__clause_element__() > other
+            self.WinRate = float(self.Wins) / float(self.GamesPlayed)
 
-    def __lt__(self, other):
-        return self.__clause_element__() < other
+Index('ix_score_guild_winrate', Score.GuildID, Score.WinRate.desc())
 
 class Guild(Base):
     __tablename__ = 'guild'